@@ -1,13 +1,16 @@
-import sqlite3
-import pandas as pd
+import os
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+
 from pipelines.generate_sample import (
-    create_sub_sample, determine_percent_flights, add_tail_numbers,
-    add_segment, add_market_structure, misspecification_test, add_metro_level_statistics, get_depart_datetime,
-    add_husize_dummies, add_hubsize_interactions, add_lagged_hubsize_interactions, create_merger_ids, add_weather_data,
-    print_missing_flights, print_missing_data_summary, print_selection_criteria_flights, print_subsample_diagnosis,
-    print_variable_names, save_csv_mergers
+    create_sub_sample, downcast_flight_keys, determine_percent_flights, tail_number_lookups, segment_lookups,
+    market_structure_lookups, misspecification_test_lookups, add_metro_level_statistics, merge_lookups,
+    load_lookups_concurrently, get_depart_datetime, add_husize_dummies, add_hubsize_interactions,
+    add_lagged_hubsize_interactions, create_merger_ids, add_weather_data, print_missing_flights,
+    print_missing_data_summary, missing_value_summary, print_selection_criteria_flights, print_subsample_diagnosis,
+    print_variable_names, save_csv_mergers, read_sql_cached, open_connection, run_stage_checkpointed
 )
 
 def main():
@@ -20,154 +23,179 @@ def main():
     # primitives
     here = Path(__file__).resolve().parent
     db_source = str((here / ".." / "delaydata.db").resolve())
+    cache_dir = here / ".cache" # parquet copies of small lookup tables
 
     # constants
     pct_subsample =0.02 # percentage of flights included in the sample
     random_seed = 99
 
-    # ----- GENERATES A RANDOM SUBSAMPLE FROM A SAMPLE OF FLIGHTS -----
-    flights_df, num_total_flights = create_sub_sample(pct_subsample,db_source,random_seed)
-
-    # number of flights after random sampling
-    subsample_num_flights = len(flights_df)
-
-
-    # Print diagnostics
-    if print_diag:
-        print_subsample_diagnosis(flights_df)
-
-
-    # ----- AIRPORTS AND AIRLINES TO ANALYSE -----
-    with sqlite3.connect(db_source) as conn:
-        airports_to_analyze = pd.read_sql_query(
-            """
-                SELECT OriginAirportID AS origin_airport_id FROM airports_to_analyze
-            """, conn)
-        airlines_list = pd.read_sql_query(
-            """
+    # Single connection shared by the main-thread reads; a larger page cache and memory-mapped
+    # I/O keep hot pages resident between the lookup queries.
+    conn = open_connection(db_source)
+
+    try:
+        # Sampling, selection and the lookup merges form one stage; with AMS_CHECKPOINT set, its
+        # output is kept in the cache so development re-runs start from the merged frame.
+        def build_merged_sample():
+            # ----- GENERATES A RANDOM SUBSAMPLE FROM A SAMPLE OF FLIGHTS -----
+            flights_df, num_total_flights = create_sub_sample(pct_subsample,conn,random_seed)
+            flights_df = downcast_flight_keys(flights_df)
+
+            # number of flights after random sampling
+            subsample_num_flights = len(flights_df)
+
+            # remove flights with origin and destination with fewer than 10 flights for origin or destination and from airlines
+            # outside the continental United States (flag computed in SQL by create_sub_sample)
+            keep_large_airports = flights_df.pop("in_airports_to_analyze").to_numpy(dtype=bool)
+
+
+            # Print diagnostics
+            if print_diag:
+                print_subsample_diagnosis(flights_df)
+
+
+            # ----- AIRPORTS AND AIRLINES TO ANALYSE -----
+            airports_to_analyze = read_sql_cached(
+                "airports_to_analyze",
+                """
+                    SELECT OriginAirportID AS origin_airport_id FROM airports_to_analyze
+                """, conn, db_source, cache_dir)
+            airlines_list = read_sql_cached(
+                "airlines_to_analyze",
+                """
+                    SELECT 
+                        DOT_ID_Reporting_Airline AS dot_id_reporting_airline 
+                    FROM airlines_to_analyze
+                """, conn, db_source, cache_dir)
+
+            # ----- CARRIER INFO TO ADD TO REGRESSIONS -----
+            carrier_info = read_sql_cached(
+                "carrier_info",
+                """
                 SELECT 
-                    DOT_ID_Reporting_Airline AS dot_id_reporting_airline 
-                FROM airlines_to_analyze
-            """, conn)
-
-    # ----- CARRIER INFO TO ADD TO REGRESSIONS -----
-        carrier_info = pd.read_sql_query(
-            """
-            SELECT 
-                Airline_id AS airline_id, 
-                unique_carrier_name, 
-                start_date_source, 
-                thru_date_source 
-            FROM carrier_info
-            """,
-            conn)
-
-
-
-    # ----- FIND INDEX TO REMOVE AIRLINES WITH FEWER THAN 1% OF FLIGHTS -----
-    # Percent of flights by airline
-    keep_large_airlines, large_airlines = determine_percent_flights(flights_df, carrier_info, airlines_list)
-
-
-    # remove flights with origin and destination with fewer than 10 flights for origin or destination and from airlines
-    # outside the continental United States
-    keep_large_airports = (
-        flights_df['origin_airport_id'].isin(airports_to_analyze['origin_airport_id']) &
-        flights_df['dest_airport_id'].isin(airports_to_analyze['origin_airport_id'])
-    )
+                    Airline_id AS airline_id, 
+                    unique_carrier_name, 
+                    start_date_source, 
+                    thru_date_source 
+                FROM carrier_info
+                """,
+                conn, db_source, cache_dir,
+                dtype={"unique_carrier_name": "category"})
 
 
-    # ----- INFORMATION ON FLIGHTS THAT ARE BEING DROPPED BY NOT MEETING THE SELECTION CRITERIA -----
 
-    print_selection_criteria_flights(num_total_flights,subsample_num_flights,keep_large_airports,
-                                         keep_large_airlines)
+            # ----- FIND INDEX TO REMOVE AIRLINES WITH FEWER THAN 1% OF FLIGHTS -----
+            # Percent of flights by airline
+            keep_large_airlines, large_airlines = determine_percent_flights(flights_df, carrier_info, airlines_list)
 
 
-    # ----- DROP FLIGHTS THAT DO NOT SATISFY THE CONDITIONS FOR FLIGHT AND AIRPORTS -----
-    keep_obs_mask = keep_large_airlines & keep_large_airports
-    flights_df = flights_df[keep_obs_mask].copy()
+            # ----- INFORMATION ON FLIGHTS THAT ARE BEING DROPPED BY NOT MEETING THE SELECTION CRITERIA -----
 
+            print_selection_criteria_flights(num_total_flights,subsample_num_flights,keep_large_airports,
+                                                 keep_large_airlines)
 
-    # ----- ADD TAIL NUMBERS TO DATASET ----
-    flights_df = add_tail_numbers(flights_df, db_source)
 
+            # ----- DROP FLIGHTS THAT DO NOT SATISFY THE CONDITIONS FOR FLIGHT AND AIRPORTS -----
+            # Plain boolean arrays: no index alignment, and iloc already returns a new frame.
+            keep_obs_mask = np.logical_and(keep_large_airlines, keep_large_airports)
+            flights_df = flights_df.iloc[keep_obs_mask]
 
-    # ----- CONNECT SEGMENT DATA TO THE DATASET -----
-    flights_df = add_segment(flights_df, db_source, large_airlines, airports_to_analyze)
 
+            # ----- LOOKUP TABLES JOINED ONTO THE FLIGHTS -----
+            # The lookups read disjoint tables, so they are loaded concurrently (one connection per
+            # thread) and then left-joined in a single pass (see merge_lookups).
+            def flight_stats_lookups(conn):
+                # ----- GET AGGREGATE FLIGHT LEVEL DATA -----
+                flight_stats = read_sql_cached(
+                    "daily_flight_stats",
+                    """
+                    SELECT 
+                        DayofMonth as day_of_month,
+                        Month as month, 
+                        Year as year, 
+                        ScheduledFlights as scheduled_flights 
+                    FROM daily_flight_stats""", conn, db_source, cache_dir,
+                    dtype={"day_of_month": "int8", "month": "int8", "year": "int16", "scheduled_flights": "int32"})
+                return [(flight_stats, ['day_of_month','year','month'])]
 
-    # ----- ADD AIRPORT MARKET CONCENTRATION AND HUB SIZE -----
-    flights_df = add_market_structure(flights_df, db_source)
+            lookups = load_lookups_concurrently(db_source, [
+                # ----- ADD TAIL NUMBERS TO DATASET ----
+                partial(tail_number_lookups, db_source=db_source, cache_dir=cache_dir),
+                # ----- CONNECT SEGMENT DATA TO THE DATASET -----
+                partial(segment_lookups, large_airlines=large_airlines, airports_to_analyze=airports_to_analyze),
+                # ----- ADD AIRPORT MARKET CONCENTRATION AND HUB SIZE -----
+                partial(market_structure_lookups, db_source=db_source, cache_dir=cache_dir),
+                # ----- ADD MARKET SHARE AND MISSPECIFICATION TEST VARIABLES
+                partial(misspecification_test_lookups, db_source=db_source, cache_dir=cache_dir),
+                flight_stats_lookups,
+            ])
 
+            flights_df = merge_lookups(flights_df, lookups)
 
-    # ----- ADD MARKET SHARE AND MISSPECIFICATION TEST VARIABLES
-    # Add additional market structure variables for misspecification tests
-    flights_df = misspecification_test(flights_df, db_source)
+            # ----- ADD METROPOLITAN STATISTICAL AREA INFO -----
+            # - note: For missing observations, imputed the average values -> No missing values
+            flights_df = add_metro_level_statistics(flights_df, conn, db_source, cache_dir)
 
+            return flights_df
 
-    # ----- GET AGGREGATE FLIGHT LEVEL DATA -----
-    with sqlite3.connect(db_source) as conn:
-        flight_stats = pd.read_sql_query(
-            """
-            SELECT 
-                DayofMonth as day_of_month,
-                Month as month, 
-                Year as year, 
-                ScheduledFlights as scheduled_flights 
-            FROM daily_flight_stats""",conn)
+        flights_df = run_stage_checkpointed(
+            f"stage_lookups_{pct_subsample}_{random_seed}", build_merged_sample, db_source, cache_dir,
+            enabled=bool(os.getenv("AMS_CHECKPOINT")))
 
-    flights_df = flights_df.merge(flight_stats,how='left',on=['day_of_month','year','month'])
 
+        # ----- DETERMINE DATETIME FROM COLUMNS -----
+        flights_df = get_depart_datetime(flights_df)
 
-    # ----- ADD METROPOLITAN STATISTICAL AREA INFO -----
-    # - note: For missing observations, imputed the average values -> No missing values
-    flights_df = add_metro_level_statistics(flights_df, db_source)
 
+        # ----- ADD HUB SIZE DUMMIES -----
+        flights_df = add_husize_dummies(flights_df)
 
-    # ----- DETERMINE DATETIME FROM COLUMNS -----
-    flights_df = get_depart_datetime(flights_df)
 
+        # ----- MARKET STRUCTURE HUB SIZE INTERACTIONS -----
+        flights_df = add_hubsize_interactions(flights_df)
 
-    # ----- ADD HUB SIZE DUMMIES -----
-    flights_df = add_husize_dummies(flights_df)
 
+        # ----- MARKET STRUCTURE HUB SIZE LAGGED INTERACTIONS -----
+        flights_df = add_lagged_hubsize_interactions(flights_df)
 
-    # ----- MARKET STRUCTURE HUB SIZE INTERACTIONS -----
-    flights_df = add_hubsize_interactions(flights_df)
 
+        # ----- CREATE NEW ID FOR POST-MERGER AIRLINES -----
+        flights_df = create_merger_ids(flights_df, conn)
 
-    # ----- MARKET STRUCTURE HUB SIZE LAGGED INTERACTIONS -----
-    flights_df = add_lagged_hubsize_interactions(flights_df)
 
+        # ----- ADDING WEATHER DATA -----
+        flights_df = add_weather_data(flights_df, conn, db_source, cache_dir=cache_dir)
 
-    # ----- CREATE NEW ID FOR POST-MERGER AIRLINES -----
-    flights_df = create_merger_ids(flights_df, db_source)
 
+        # One missing-value scan shared by the diagnostics and the final row drop.
+        na_counts, row_has_na = missing_value_summary(flights_df)
 
-    # ----- ADDING WEATHER DATA -----
-    flights_df = add_weather_data(flights_df, db_source)
 
+        # ----- PRINTING THE MAIN SOURCES OF MISSING DATA -----
+        print_missing_data_summary(flights_df, na_counts, row_has_na)
 
-    # ----- PRINTING THE MAIN SOURCES OF MISSING DATA -----
-    print_missing_data_summary(flights_df)
 
+        # ----- PRINT THE TABLE OF COUNT OF MISSING DATA BY VARIABLE NAME -----
+        if print_diag:
+            print_missing_flights(flights_df, na_counts)
 
-    # ----- PRINT THE TABLE OF COUNT OF MISSING DATA BY VARIABLE NAME -----
-    if print_diag:
-        print_missing_flights(flights_df)
+        if print_diag:
+            print_variable_names(flights_df)
 
-    if print_diag:
-        print_variable_names(flights_df)
+        # Drop rows with any missing value (same as dropna(how='any')).
+        flights_df = flights_df.iloc[~row_has_na]
 
-    flights_df = flights_df.dropna(axis=0, how='any')
+        if save_full_data:
+            # Save full dataset (Parquet keeps dtypes and is much smaller than CSV)
+            flights_df.to_parquet("flights_df.parquet", engine="pyarrow", compression="zstd",
+                                  index=False, row_group_size=100_000)
 
-    if save_full_data:
-        # Save full dataset
-        flights_df.to_csv("flights_df.csv", index=False)
+        if save_mergers:
+            # save mergers dataset
+            save_csv_mergers(flights_df)
 
-    if save_mergers:
-        # save mergers dataset
-        save_csv_mergers(flights_df)
+    finally:
+        conn.close()
 
 
 
@@ -1,33 +1,220 @@
+import hashlib
+import json
+import os
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from pathlib import Path
+from typing import Callable
 
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from tqdm import tqdm
 from pprint import pprint
 
 
+def open_connection(db_source: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open a read connection to the SQLite database with a larger page cache and memory-mapped I/O.
+
+    Parameters
+    ----------
+    db_source : str
+        Path to the SQLite database.
+    check_same_thread : bool, default True
+        Passed to `sqlite3.connect`. Set to False only for a connection that is used by a
+        single worker thread but closed by the thread that owns the pool.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Open connection; the caller is responsible for closing it.
+    """
+    # Opened read-only at the file level (mode=ro), which also fails loudly on a wrong path
+    # instead of silently creating an empty database.
+    conn = sqlite3.connect(
+        f"{Path(db_source).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=check_same_thread
+    )
+    # Read-only tuning: 512 MB page cache, 2 GB memory map, in-memory temp b-trees for
+    # GROUP BY / ORDER BY. journal_mode and page_size are left alone since they rewrite the
+    # database file, and the pipeline never writes to it.
+    conn.executescript(
+        "PRAGMA query_only=ON;"
+        "PRAGMA cache_size=-524288;"
+        "PRAGMA mmap_size=2147483648;"
+        "PRAGMA temp_store=MEMORY;"
+    )
+    return conn
+
+
+def _cache_is_fresh(cache_path: Path, db_source: str) -> bool:
+    """Return True if `cache_path` exists and was written after the last change to the database."""
+    return cache_path.exists() and cache_path.stat().st_mtime > os.path.getmtime(db_source)
+
+
+def run_stage_checkpointed(
+    name: str,
+    build: Callable[[], pd.DataFrame],
+    db_source: str,
+    cache_dir: str | Path,
+    enabled: bool = True,
+) -> pd.DataFrame:
+    """
+    Run a pipeline stage, or reload its Parquet checkpoint from a previous run.
+
+    Intended for development: re-runs that only change late-stage helpers skip the sampling,
+    SQL reads and lookup merges. The checkpoint is rebuilt whenever the database is newer than
+    it; it does not track code changes, so delete it after editing the stage itself.
+
+    Parameters
+    ----------
+    name : str
+        Checkpoint name; the file is `{cache_dir}/{name}.parquet`. Include any settings the
+        stage depends on (e.g. subsample share and seed) in the name.
+    build : callable
+        Zero-argument function that runs the stage and returns its DataFrame.
+    db_source : str
+        Path to the SQLite database (its modification time invalidates the checkpoint).
+    cache_dir : str or Path
+        Directory holding the checkpoint files.
+    enabled : bool, default True
+        If False, always run `build` and neither read nor write a checkpoint.
+
+    Returns
+    -------
+    pd.DataFrame
+        The stage output (with a fresh RangeIndex when reloaded).
+    """
+    if not enabled:
+        return build()
+
+    checkpoint_path = Path(cache_dir) / f"{name}.parquet"
+    if _cache_is_fresh(checkpoint_path, db_source):
+        print(f"Loaded checkpoint {checkpoint_path}")
+        print("")
+        return pd.read_parquet(checkpoint_path)
+
+    df = build()
+
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(checkpoint_path, engine="pyarrow", compression="zstd", index=False)
+    return df
+
+
+def read_sql_cached(
+    name: str,
+    query: str,
+    conn: sqlite3.Connection,
+    db_source: str | None,
+    cache_dir: str | Path | None,
+    dtype: dict[str, str] | None = None,
+    force_refresh: bool = False,
+) -> pd.DataFrame:
+    """
+    Read a small SQLite lookup table, caching the result as Parquet between runs.
+
+    The cached file `{cache_dir}/{name}-{digest}.parquet` is reused as long as it is newer than
+    the SQLite database; otherwise the query is re-run and the cache is rewritten. `digest` is a
+    short hash of the query text and `dtype`, so editing either starts a new cache file instead
+    of reusing a stale one. With no `cache_dir` (or `db_source`) the query is simply run.
+
+    Parameters
+    ----------
+    name : str
+        Cache file stem (typically the source table name).
+    query : str
+        SQL query used to build the table on a cache miss.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str or None
+        Path to the SQLite database (its modification time invalidates the cache).
+    cache_dir : str, Path or None
+        Directory holding the Parquet cache files; None disables caching.
+    dtype : dict, optional
+        Column dtypes applied to the query result (e.g. narrow integers or "category").
+        The dtypes are stored in the Parquet file, so cached reads return them unchanged.
+    force_refresh : bool, default False
+        Re-run the query and rewrite the cache even if it is up to date.
+
+    Returns
+    -------
+    pd.DataFrame
+        Query result, read either from the cache or from SQLite.
+    """
+    if cache_dir is None or db_source is None:
+        return pd.read_sql_query(query, conn, dtype=dtype)
+
+    # Key the file on the query and dtypes as well as the name.
+    key = json.dumps([query, sorted((dtype or {}).items())], default=str)
+    digest = hashlib.sha256(key.encode()).hexdigest()[:12]
+    cache_path = Path(cache_dir) / f"{name}-{digest}.parquet"
+
+    # Reuse the cache only if it was written after the last change to the database.
+    if not force_refresh and _cache_is_fresh(cache_path, db_source):
+        return pd.read_parquet(cache_path)
+
+    df = pd.read_sql_query(query, conn, dtype=dtype)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
+    return df
+
+
+# snake_case names for the `flights_data` columns the pipeline uses. The renaming is done in the
+# SELECT list of `create_sub_sample`, so the columns arrive from SQLite already named.
+FLIGHT_COLUMN_NAMES = {
+    "DepDelay": "dep_delay",
+    "ArrDelay": "arr_delay",
+    "ActualElapsedTime": "actual_elapsed_time",
+    "CRSElapsedTime": "crs_elapsed_time",
+    "OriginAirportID": "origin_airport_id",
+    "DestAirportID": "dest_airport_id",
+    "DOT_ID_Reporting_Airline": "dot_id_reporting_airline",
+    "ScheduledHour": "scheduled_hour",
+    "Year": "year",
+    "Month": "month",
+    "DayofMonth": "day_of_month",
+    "DayOfWeek": "day_of_week",
+    "MonopolyRoute": "monopoly_route",
+    "Distance": "distance",
+    "TailNumberId": "tail_number_id",
+    "Flight_Number_Reporting_Airline": "flight_number_reporting_airline",
+    "CRSDepTime": "crs_dep_time",
+    "CRSArrTime": "crs_arr_time",
+    "DepTime": "dep_time",
+    "ArrTime": "arr_time",
+}
+
+
 def create_sub_sample(
     pct_subsample: float,
-    db_source: str,
+    conn: sqlite3.Connection,
     random_seed: int,
     year_min: int = 2004,
 ) -> tuple[pd.DataFrame, int]:
     """
     Draw a reproducible random subsample of flights from the SQLite `flights_data` table.
 
-    This function samples by SQLite `rowid`, then reads the underlying table in rowid
-    ranges ("chunks") and filters to the sampled rowids. It returns the subsampled flights
-    as a DataFrame and the total number of eligible flights.
+    This function samples by SQLite `rowid`, then fetches only the sampled rows by primary-key
+    lookup, in 100 batches of rowids (passed to SQLite as a JSON array, so the connection can
+    stay read-only). It returns the subsampled flights, in rowid order, as a DataFrame and the
+    total number of eligible flights.
+
+    The airport inclusion criterion (origin and destination both in `airports_to_analyze`)
+    is evaluated inside the query and returned as the 0/1 column `in_airports_to_analyze`.
+    Rows are not dropped here because the airline selection step is computed over the
+    full subsample.
 
     Parameters
     ----------
     pct_subsample : float
         Fraction of eligible flights to sample (e.g., 0.02 for 2%).
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
     random_seed : int
         Seed for reproducible random sampling.
     year_min : int, default 2004
@@ -36,16 +223,16 @@ def create_sub_sample(
     Returns
     -------
     (return_df, num_total_flights) : tuple[pd.DataFrame, int]
-        return_df is the subsampled flights DataFrame with selected columns renamed to
-        snake_case. num_total_flights is the total number of eligible flights.
+        return_df is the subsampled flights DataFrame with the columns in FLIGHT_COLUMN_NAMES
+        renamed to snake_case (plus `in_airports_to_analyze`). num_total_flights is the total number of eligible flights.
     """
-    # Pull actual rowids (robust to gaps) for the sampling frame.
-    with sqlite3.connect(db_source) as conn:
-        rowids = pd.read_sql_query(
-            "SELECT rowid FROM flights_data WHERE year >= ?",
-            conn,
-            params=(year_min,),
-        )["rowid"].to_numpy()
+    # Pull actual rowids (robust to gaps) for the sampling frame, streamed from the cursor
+    # straight into an int64 array. The query order is kept as is: the seeded draw below
+    # picks positions in this array, so reordering it would change the sample.
+    rowids = np.fromiter(
+        (rowid for (rowid,) in conn.execute("SELECT rowid FROM flights_data WHERE year >= ?", (year_min,))),
+        dtype=np.int64,
+    )
 
     rng = np.random.default_rng(random_seed)
     num_total_flights = len(rowids)
@@ -53,61 +240,130 @@ def create_sub_sample(
     # Number of flights to sample (rounded to nearest integer).
     k = round(num_total_flights * pct_subsample)
 
-    # Randomly sample rowids without replacement; sort for stable min/max chunking.
+    # Randomly sample rowids without replacement; sort so the batches come back in rowid order.
     sampled = np.sort(rng.choice(rowids, size=k, replace=False))
-    sampled_set = set(sampled.tolist())
 
     print(f"Sampling {k} of {num_total_flights} flights.")
 
-    chunks: list[pd.DataFrame] = []
-    with sqlite3.connect(db_source) as conn:
-        # Read the table in 100 rowid ranges between sampled min/max, then filter to sampled rowids.
-        rmin, rmax = int(sampled.min()), int(sampled.max()) + 1
-        for x in tqdm(range(100), desc="Reading flights_data chunks"):
-            low = rmin + int(x * (rmax - rmin) / 100)
-            high = rmin + int((x + 1) * (rmax - rmin) / 100)
-
-            temp_df = pd.read_sql_query(
-                "SELECT rowid, * FROM flights_data WHERE rowid >= ? AND rowid < ? AND year >= ?",
-                conn,
-                params=(low, high, year_min),
-            )
+    if k == 0:
+        raise ValueError(
+            f"No flights sampled: pct_subsample={pct_subsample} of {num_total_flights} eligible "
+            f"flights (year >= {year_min}) rounds to zero rows."
+        )
 
-            # Keep only sampled rowids within this chunk.
-            chunks.append(temp_df[temp_df["rowid"].isin(sampled_set)])
+    # Every column of `flights_data` is selected, in table order, with the pipeline's columns
+    # aliased to their snake_case names (see FLIGHT_COLUMN_NAMES).
+    table_columns = [name for _, name, *_ in conn.execute("PRAGMA table_info(flights_data)")]
+    select_list = ",\n                ".join(
+        f'"{name}" AS {FLIGHT_COLUMN_NAMES[name]}' if name in FLIGHT_COLUMN_NAMES else f'"{name}"'
+        for name in table_columns
+    )
+    output_columns = [
+        "rowid",
+        *(FLIGHT_COLUMN_NAMES.get(name, name) for name in table_columns),
+        "in_airports_to_analyze",
+    ]
 
-    print("")
-    return_df = pd.concat(chunks, ignore_index=True)
+    # Numeric columns are written straight into one preallocated array each, so the sample is not
+    # held twice (as batch frames and as their concatenation). A column whose dtype is not fixed
+    # across batches is kept as per-batch pieces instead and joined with pd.concat, which resolves
+    # its dtype exactly as concatenating the batch frames did:
+    #   - an integer column with NULLs in some batch arrives as float64 there; the int64 rows read
+    #     so far become the first piece and int64 + float64 pieces concatenate to float64;
+    #   - text columns (and batches in which a column is entirely NULL) arrive as object; they
+    #     are concatenated as single-column DataFrames, so all-missing pieces are resolved the
+    #     same way DataFrame concatenation resolves them.
+    columns: dict[str, np.ndarray] = {}
+    pieces: dict[str, list[pd.DataFrame]] = {}
+    start = 0
+    # Only the sampled rows cross the SQLite boundary: each batch of rowids is unpacked with
+    # json_each and looked up on the rowid primary key. Empty batches (fewer than 100 sampled
+    # flights) are not queried.
+    batches = [batch for batch in np.array_split(sampled, 100) if len(batch)]
+    for batch in tqdm(batches, desc="Reading flights_data chunks"):
+        # The airport inclusion criterion is evaluated by SQLite while the rows are read.
+        chunk = pd.read_sql_query(
+            f"""
+            SELECT
+                rowid,
+                {select_list},
+                COALESCE(
+                    OriginAirportID IN (SELECT OriginAirportID FROM airports_to_analyze)
+                    AND DestAirportID IN (SELECT OriginAirportID FROM airports_to_analyze),
+                    0
+                ) AS in_airports_to_analyze
+            FROM flights_data
+            WHERE rowid IN (SELECT value FROM json_each(?)) AND year >= ?
+            ORDER BY rowid
+            """,
+            conn,
+            params=(json.dumps(batch.tolist()), year_min),
+        )
+        stop = start + len(chunk)
+        for name, values in chunk.items():
+            column = columns.get(name)
+            if column is None and name not in pieces:
+                if values.dtype.kind in "if":
+                    column = columns[name] = np.empty(len(sampled), dtype=values.dtype)
+                else:
+                    pieces[name] = []
+            if column is not None and values.dtype != column.dtype:
+                # The dtype changed between batches: hand the rows read so far over to pd.concat.
+                pieces[name] = [pd.DataFrame({name: column[:start]})]
+                del columns[name]
+                column = None
+            if column is not None:
+                column[start:stop] = values.to_numpy()
+            else:
+                pieces[name].append(chunk[[name]])
+        start = stop
 
-    # Normalize columns to snake_case for pipeline consistency.
-    return_df = return_df.rename(
-        columns={
-            "DepDelay": "dep_delay",
-            "ArrDelay": "arr_delay",
-            "ActualElapsedTime": "actual_elapsed_time",
-            "CRSElapsedTime": "crs_elapsed_time",
-            "OriginAirportID": "origin_airport_id",
-            "DestAirportID": "dest_airport_id",
-            "DOT_ID_Reporting_Airline": "dot_id_reporting_airline",
-            "ScheduledHour": "scheduled_hour",
-            "Year": "year",
-            "Month": "month",
-            "DayofMonth": "day_of_month",
-            "DayOfWeek": "day_of_week",
-            "MonopolyRoute": "monopoly_route",
-            "Distance": "distance",
-            "TailNumberId": "tail_number_id",
-            "Flight_Number_Reporting_Airline": "flight_number_reporting_airline",
-            "CRSDepTime": "crs_dep_time",
-            "CRSArrTime": "crs_arr_time",
-            "DepTime": "dep_time",
-            "ArrTime": "arr_time",
-        }
+    print("")
+    return_df = pd.DataFrame(
+        {
+            name: columns[name][:start] if name in columns else pd.concat(pieces[name], ignore_index=True)[name]
+            for name in output_columns
+        },
+        copy=False,
     )
-
     return return_df, num_total_flights
 
 
+# Narrow integer dtypes for the flight-level keys (SQLite returns everything as int64).
+FLIGHT_KEY_DTYPES = {
+    "year": "int16",
+    "month": "int8",
+    "day_of_month": "int8",
+    "origin_airport_id": "int32",
+    "dest_airport_id": "int32",
+    "dot_id_reporting_airline": "int32",
+}
+
+
+def downcast_flight_keys(flights_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast the flight-level key columns to narrow integer dtypes.
+
+    Columns that came back from SQLite with missing values (and are therefore float) are left
+    unchanged.
+
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Subsampled flights, as returned by `create_sub_sample`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same DataFrame with the columns in `FLIGHT_KEY_DTYPES` downcast.
+    """
+    for col, dtype in FLIGHT_KEY_DTYPES.items():
+        if col in flights_df and pd.api.types.is_integer_dtype(flights_df[col]):
+            flights_df[col] = flights_df[col].astype(dtype)
+
+    return flights_df
+
+
 def print_subsample_diagnosis(flights_df: pd.DataFrame) -> None:
     """Print basic shape and column diagnostics for a subsampled flights DataFrame."""
     print("Produced dataframe")
@@ -121,41 +377,51 @@ def determine_percent_flights(
     flights_df: pd.DataFrame,
     carrier_info: pd.DataFrame,
     airlines_list: pd.DataFrame,
-) -> tuple[pd.Series, np.ndarray]:
+) -> tuple[np.ndarray, np.ndarray]:
     """
     Identify 'large' airlines based on an average-percent rule and return:
       (keep_mask, large_airlines_array)
 
+    keep_mask is a plain boolean array aligned with the rows of flights_df.
+
     Expects snake_case columns:
       flights_df: dot_id_reporting_airline, year, month
       airlines_list: dot_id_reporting_airline
       carrier_info: airline_id (optional; used only for optional diagnostics)
+
+    Each airline's share is scaled by its own span in the sample. A small carrier present for a
+    single month is scaled up to a 16-year equivalent and kept next to a large carrier that
+    flies throughout:
+
+    >>> flights = pd.DataFrame({
+    ...     "dot_id_reporting_airline": [1] + [2] * 192,
+    ...     "year": [2010] + list(np.repeat(np.arange(2004, 2020), 12)),
+    ...     "month": [6] + list(np.tile(np.arange(1, 13), 16)),
+    ... })
+    >>> keep, large = determine_percent_flights(
+    ...     flights, None, pd.DataFrame({"dot_id_reporting_airline": [1, 2]})
+    ... )
+    >>> large.tolist(), int(keep.sum())
+    ([1, 2], 193)
     """
+    # Flight count and first/last month in the sample per airline, in one grouped pass, so the
+    # share and the span of each airline come from the same row (keyed by airline id).
+    yearmonth = flights_df["year"].to_numpy() + flights_df["month"].to_numpy() / 12
     percent_flights = (
-        flights_df["dot_id_reporting_airline"]
-        .value_counts(normalize=True)
-        .mul(100)
-        .rename("percent")
-        .to_frame()
-    )
-
-    yearmonth = flights_df["year"] + flights_df["month"] / 12
-
-    span = (
-        pd.DataFrame(
-            {
-                "dot_id_reporting_airline": flights_df["dot_id_reporting_airline"].to_numpy(),
-                "yearmonth": yearmonth.to_numpy(),
-            }
-        )
-        .groupby("dot_id_reporting_airline")["yearmonth"]
-        .agg(["min", "max"])
+        pd.Series(yearmonth)
+        .groupby(flights_df["dot_id_reporting_airline"].to_numpy())
+        .agg(["size", "min", "max"])
     )
 
-    percent_flights["years_in_sample"] = (span["max"] - span["min"] + 1 / 12).values
+    percent_flights["percent"] = percent_flights["size"] / percent_flights["size"].sum() * 100
+    percent_flights["years_in_sample"] = percent_flights["max"] - percent_flights["min"] + 1 / 12
     percent_flights["average_percent"] = percent_flights["percent"] * 16 / percent_flights["years_in_sample"]
 
-    percent_flights = percent_flights.reset_index().rename(columns={"dot_id_reporting_airline": "airline_id"})
+    percent_flights = (
+        percent_flights[["percent", "years_in_sample", "average_percent"]]
+        .rename_axis("airline_id")
+        .reset_index()
+    )
 
     large_airlines = percent_flights.loc[percent_flights["average_percent"] > 1, "airline_id"].to_numpy()
 
@@ -164,10 +430,9 @@ def determine_percent_flights(
     #            .merge(carrier_info, on="airline_id", how="left")
     #            .sort_values("average_percent"))
 
-    keep_large_airlines = (
-        flights_df["dot_id_reporting_airline"].isin(large_airlines)
-        & flights_df["dot_id_reporting_airline"].isin(airlines_list["dot_id_reporting_airline"])
-    )
+    # Both airline conditions reduce to one membership test on the raw int codes.
+    keep_airlines = np.intersect1d(large_airlines, airlines_list["dot_id_reporting_airline"].to_numpy())
+    keep_large_airlines = np.isin(flights_df["dot_id_reporting_airline"].to_numpy(), keep_airlines)
 
     return keep_large_airlines, large_airlines
 
@@ -218,7 +483,180 @@ def print_selection_criteria_flights(
 
 
 
-def add_tail_numbers(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+# A lookup table and the flight-level columns it is left-joined on.
+Lookup = tuple[pd.DataFrame, list[str]]
+
+# Airport sides filled in for "{side}" placeholders in side-templated lookups (see merge_lookups).
+SIDES = ("origin", "dest")
+
+
+def _match_key_dtypes(lookup: pd.DataFrame, key_dtypes: dict[str, np.dtype]) -> pd.DataFrame:
+    """
+    Cast integer join keys of a lookup to the (narrow) integer dtypes of the flight keys.
+
+    Lookups come back from SQLite as int64 while the flight keys are downcast (see
+    `downcast_flight_keys`); matching widths lets the key hashing and index lookups compare like
+    with like. Keys whose values would not fit the narrower type are left unchanged.
+    """
+    casts = {}
+    for key, target in key_dtypes.items():
+        current = lookup[key].dtype
+        both_integer = pd.api.types.is_integer_dtype(target) and pd.api.types.is_integer_dtype(current)
+        if target == current or not both_integer:
+            continue
+        info = np.iinfo(target)
+        if lookup[key].between(info.min, info.max).all():
+            casts[key] = target
+
+    return lookup.astype(casts) if casts else lookup
+
+
+def merge_lookups(flights_df: pd.DataFrame, lookups: list[Lookup]) -> pd.DataFrame:
+    """
+    Left-join several lookup tables onto flights_df, appending all new columns at once.
+
+    Each lookup is indexed by its join keys and reindexed against the flight-level keys, so
+    every lookup is gathered in a single pass and flights_df is copied only once (by the final
+    concat) rather than once per merge. Unmatched keys produce missing values, as with a
+    left merge. A lookup with duplicate keys falls back to `DataFrame.merge`, which keeps the
+    row-multiplying semantics of the original join.
+
+    Airport-level tables that are joined once by origin and once by destination can be given
+    once, with "{side}" placeholders in their key and column names (e.g. "{side}_airport_id",
+    "hhi_{side}"). The origin and destination flight keys are then stacked and looked up in a
+    single reindex, and the result is split into the origin columns followed by the dest columns.
+
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Flight-level data containing every join key referenced in `lookups`.
+    lookups : list of (pd.DataFrame, list[str])
+        Lookup tables paired with their join keys, merged in the order given.
+
+    Returns
+    -------
+    pd.DataFrame
+        flights_df with the non-key columns of every lookup appended.
+    """
+    pending: list[pd.DataFrame] = []
+
+    for lookup, keys in lookups:
+        by_side = any("{side}" in key for key in keys)
+        side_keys = [[key.format(side=side) for key in keys] for side in SIDES] if by_side else [keys]
+
+        # Cast keys to the first side's flight dtypes (origin and dest keys share dtypes).
+        lookup = _match_key_dtypes(lookup, {key: flights_df[on].dtype for key, on in zip(keys, side_keys[0])})
+        right = lookup.set_index(keys)
+
+        if not right.index.is_unique:
+            # Flush gathered columns first so column order matches sequential merges.
+            flights_df = pd.concat([flights_df, *pending], axis=1)
+            pending = []
+            for side, on in zip(SIDES, side_keys):
+                side_lookup = lookup.rename(columns=lambda col: col.format(side=side)) if by_side else lookup
+                flights_df = flights_df.merge(side_lookup, how="left", on=on)
+            continue
+
+        # Stack the flight keys of every side so the lookup is probed in one reindex.
+        if by_side:
+            key_frame = pd.concat([flights_df[on].set_axis(keys, axis=1) for on in side_keys], ignore_index=True)
+        else:
+            key_frame = flights_df[keys]
+        if len(keys) == 1:
+            flight_keys = pd.Index(key_frame[keys[0]])
+        else:
+            flight_keys = pd.MultiIndex.from_frame(key_frame)
+        gathered = right.reindex(flight_keys)
+
+        n = len(flights_df)
+        for i, side in enumerate(SIDES if by_side else [None]):
+            part = gathered.iloc[i * n:(i + 1) * n].set_axis(flights_df.index, axis=0)
+            if by_side:
+                part = part.rename(columns=lambda col: col.format(side=side))
+            pending.append(part)
+
+    if pending:
+        flights_df = pd.concat([flights_df, *pending], axis=1)
+    return flights_df
+
+
+def load_lookups_concurrently(
+    db_source: str,
+    loaders: list[Callable[[sqlite3.Connection], list[Lookup]]],
+) -> list[Lookup]:
+    """
+    Run independent lookup loaders in a thread pool and concatenate their results in order.
+
+    Each loader receives its own connection (sqlite3 connections cannot be shared across
+    threads). SQLite releases the GIL while stepping through rows, so the reads overlap.
+
+    Parameters
+    ----------
+    db_source : str
+        Path to the SQLite database.
+    loaders : list of callables
+        Functions taking an open connection and returning a list of lookups
+        (e.g. `tail_number_lookups` or a `functools.partial` of `segment_lookups`).
+
+    Returns
+    -------
+    list of (pd.DataFrame, list[str])
+        All lookups, in the order of `loaders`, for use with `merge_lookups`.
+    """
+    def run(loader: Callable[[sqlite3.Connection], list[Lookup]]) -> list[Lookup]:
+        conn = open_connection(db_source)
+        try:
+            return loader(conn)
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=max(len(loaders), 1)) as executor:
+        results = list(executor.map(run, loaders))
+
+    return [lookup for result in results for lookup in result]
+
+
+def tail_number_lookups(
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> list[Lookup]:
+    """
+    Load the aircraft seat capacity (num_seats) lookup, keyed by tail_number_id.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str, optional
+        Path to the SQLite database; together with `cache_dir` it enables the Parquet cache
+        (see `read_sql_cached`).
+    cache_dir : str or Path, optional
+        Directory holding the Parquet cache files.
+
+    Returns
+    -------
+    list of (pd.DataFrame, list[str])
+        The tail-number lookup and its join keys, for use with `merge_lookups`.
+    """
+    # Load tail-number seat capacity lookup.
+    tail_num_seats = read_sql_cached(
+        "tail_num_seats",
+        """
+        SELECT
+            id AS tail_number_id,
+            num_seats
+        FROM tail_num_seats
+        """,
+        conn,
+        db_source,
+        cache_dir,
+    )
+
+    return [(tail_num_seats, ["tail_number_id"])]
+
+
+def add_tail_numbers(flights_df: pd.DataFrame, conn: sqlite3.Connection) -> pd.DataFrame:
     """
     Add aircraft seat capacity (num_seats) to the flights dataset using tail_number_id.
 
@@ -230,51 +668,88 @@ def add_tail_numbers(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
     ----------
     flights_df : pd.DataFrame
         Flight-level data containing a 'tail_number_id' column.
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
 
     Returns
     -------
     pd.DataFrame
         flights_df with an additional 'num_seats' column.
     """
-    # Load tail-number seat capacity lookup.
-    with sqlite3.connect(db_source) as conn:
-        tail_num_seats = pd.read_sql_query(
-            """
-            SELECT
-                id AS tail_number_id,
-                num_seats
-            FROM tail_num_seats
-            """,
-            conn,
-        )
+    return merge_lookups(flights_df, tail_number_lookups(conn))
 
-    # Left join so all flights are preserved; unmatched tail numbers produce missing num_seats.
-    flights_df = flights_df.merge(tail_num_seats, how="left", on="tail_number_id")
-    return flights_df
+
+def segment_lookups(
+    conn: sqlite3.Connection,
+    large_airlines: pd.Series,
+    airports_to_analyze: pd.DataFrame,
+) -> list[Lookup]:
+    """
+    Load segment-level variables (e.g., load factor), keyed by airline, route, year and month.
+
+    The segment table is filtered, inside the SQL query, to:
+      - airlines in `large_airlines`
+      - routes where both origin and destination airports are in `airports_to_analyze`
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    large_airlines : pd.Series or array-like
+        Airline IDs to keep (typically produced by the airline selection step).
+    airports_to_analyze : pd.DataFrame
+        DataFrame containing the airports to include. Must contain an 'origin_airport_id' column.
+
+    Returns
+    -------
+    list of (pd.DataFrame, list[str])
+        The segment lookup and its join keys, for use with `merge_lookups`.
+    """
+    # Load the segment rows that can match a kept flight. The id lists are passed as JSON arrays
+    # (unpacked by json_each) so the filter runs in SQLite on a read-only connection.
+    segment = pd.read_sql_query(
+        """
+        SELECT
+            Year              AS year,
+            Month             AS month,
+            Airline_Id        AS dot_id_reporting_airline,
+            Origin_Airport_Id AS origin_airport_id,
+            Dest_Airport_Id   AS dest_airport_id,
+            Loadfactor        AS load_factor
+        FROM segment
+        WHERE Airline_Id IN (SELECT value FROM json_each(:airlines))
+          AND Origin_Airport_Id IN (SELECT value FROM json_each(:airports))
+          AND Dest_Airport_Id IN (SELECT value FROM json_each(:airports))
+        """,
+        conn,
+        params={
+            "airlines": json.dumps(np.unique(np.asarray(large_airlines)).tolist()),
+            "airports": json.dumps(np.unique(airports_to_analyze["origin_airport_id"].to_numpy()).tolist()),
+        },
+    )
+
+    # Left-join: keep all flights; segment variables are missing if no match is found.
+    return [(segment, ["dot_id_reporting_airline", "origin_airport_id", "dest_airport_id", "year", "month"])]
 
 
 def add_segment(
     flights_df: pd.DataFrame,
-    db_source: str,
+    conn: sqlite3.Connection,
     large_airlines: pd.Series,
     airports_to_analyze: pd.DataFrame,
 ) -> pd.DataFrame:
     """
     Merge segment-level variables (e.g., load factor) onto the flight-level dataset.
 
-    The segment table is filtered to:
-      - airlines in `large_airlines`
-      - routes where both origin and destination airports are in `airports_to_analyze`
+    See `segment_lookups` for the airline and airport filters applied to the segment table.
 
     Parameters
     ----------
     flights_df : pd.DataFrame
         Flight-level data with keys:
         ['dot_id_reporting_airline', 'origin_airport_id', 'dest_airport_id', 'year', 'month'].
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
     large_airlines : pd.Series or array-like
         Airline IDs to keep (typically produced by the airline selection step).
     airports_to_analyze : pd.DataFrame
@@ -285,88 +760,74 @@ def add_segment(
     pd.DataFrame
         flights_df with segment variables merged in (left join).
     """
-    # Load segment table with standardized column names.
-    with sqlite3.connect(db_source) as conn:
-        segment = pd.read_sql_query(
-            """
-            SELECT
-                Year              AS year,
-                Month             AS month,
-                Airline_Id        AS dot_id_reporting_airline,
-                Origin_Airport_Id AS origin_airport_id,
-                Dest_Airport_Id   AS dest_airport_id,
-                Loadfactor        AS load_factor
-            FROM segment
-            """,
-            conn,
-        )
-
-    # Apply the same airline and airport inclusion criteria to the segment data.
-    segment_large_airline = segment["dot_id_reporting_airline"].isin(large_airlines)
-    segment_large_airports = (
-        segment["origin_airport_id"].isin(airports_to_analyze["origin_airport_id"])
-        & segment["dest_airport_id"].isin(airports_to_analyze["origin_airport_id"])
-    )
-    segment = segment.loc[segment_large_airline & segment_large_airports].copy()
-
-    # Left-join: keep all flights; segment variables are missing if no match is found.
-    flights_df = flights_df.merge(
-        segment,
-        how="left",
-        on=["dot_id_reporting_airline", "origin_airport_id", "dest_airport_id", "year", "month"],
-    )
-    return flights_df
+    return merge_lookups(flights_df, segment_lookups(conn, large_airlines, airports_to_analyze))
 
 
-def add_market_structure(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+def market_structure_lookups(
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> list[Lookup]:
     """
-    Add airport-level market structure measures (hub size and HHI) for both origin and destination.
+    Load airport-level market structure measures (hub size and HHI) for origin and destination.
 
     This function:
       1) Loads origin-airport hub size from `airport_market_info`
       2) Loads origin-airport HHI (and lagged HHI) from `new_HHI`
-      3) Merges these measures onto flights by (airport_id, year, month) for the origin airport
-      4) Reuses the same airport-level table, renaming columns to represent the destination airport,
-         and merges again by (dest_airport_id, year, month)
+      3) Combines them into one airport-level table keyed by (airport, year, month)
+      4) Returns it once, with "{side}" placeholders, so `merge_lookups` joins it by both the
+         origin and the destination airport in a single lookup
+
+    Only airports in `airports_to_analyze` are loaded (filtered in SQL); flights on other
+    airports are dropped by the sample selection and could never match.
 
     Parameters
     ----------
-    flights_df : pd.DataFrame
-        Flight-level data containing at least:
-        ['origin_airport_id', 'dest_airport_id', 'year', 'month'].
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str, optional
+        Path to the SQLite database; together with `cache_dir` it enables the Parquet cache
+        (see `read_sql_cached`).
+    cache_dir : str or Path, optional
+        Directory holding the Parquet cache files.
 
     Returns
     -------
-    pd.DataFrame
-        flights_df with additional columns for origin and destination market structure.
+    list of (pd.DataFrame, list[str])
+        A "{side}"-templated lookup and its join keys, for use with `merge_lookups`.
     """
     # Load airport-level hub size and HHI measures (keyed by airport, year, month).
-    with sqlite3.connect(db_source) as conn:
-        market_hub_size = pd.read_sql_query(
-            """
-            SELECT
-                OriginAirportID AS origin_airport_id,
-                Year            AS year,
-                Month           AS month,
-                HubSize         AS airport_hub_size_origin
-            FROM airport_market_info
-            """,
-            conn,
-        )
-        market_lagged_hhi = pd.read_sql_query(
-            """
-            SELECT
-                OriginAirportID AS origin_airport_id,
-                Year            AS year,
-                Month           AS month,
-                HHI             AS hhi_origin,
-                HHI_lagged      AS hhi_origin_lagged
-            FROM new_HHI
-            """,
-            conn,
-        )
+    market_hub_size = read_sql_cached(
+        "airport_market_info",
+        """
+        SELECT
+            OriginAirportID AS origin_airport_id,
+            Year            AS year,
+            Month           AS month,
+            HubSize         AS airport_hub_size_origin
+        FROM airport_market_info
+        WHERE OriginAirportID IN (SELECT OriginAirportID FROM airports_to_analyze)
+        """,
+        conn,
+        db_source,
+        cache_dir,
+    )
+    market_lagged_hhi = read_sql_cached(
+        "new_HHI",
+        """
+        SELECT
+            OriginAirportID AS origin_airport_id,
+            Year            AS year,
+            Month           AS month,
+            HHI             AS hhi_origin,
+            HHI_lagged      AS hhi_origin_lagged
+        FROM new_HHI
+        WHERE OriginAirportID IN (SELECT OriginAirportID FROM airports_to_analyze)
+        """,
+        conn,
+        db_source,
+        cache_dir,
+    )
 
     # Combine hub size + HHI into a single origin-airport market structure table.
     market_origin = market_hub_size.merge(
@@ -375,88 +836,114 @@ def add_market_structure(flights_df: pd.DataFrame, db_source: str) -> pd.DataFra
         how="inner",
     )
 
-    # Merge origin-airport market structure onto flights.
-    flights_df = flights_df.merge(
-        market_origin,
-        how="left",
-        on=["origin_airport_id", "year", "month"],
-    )
-
-    # Reuse the same airport-level measures for the destination airport by renaming columns.
-    market_dest = market_origin.rename(
+    # Template the airport-side names so the same table serves origin and destination.
+    market = market_origin.rename(
         columns={
-            "origin_airport_id": "dest_airport_id",
-            "hhi_origin": "hhi_dest",
-            "hhi_origin_lagged": "hhi_dest_lagged",
-            "airport_hub_size_origin": "airport_hub_size_dest",
+            "origin_airport_id": "{side}_airport_id",
+            "airport_hub_size_origin": "airport_hub_size_{side}",
+            "hhi_origin": "hhi_{side}",
+            "hhi_origin_lagged": "hhi_{side}_lagged",
         }
     )
 
-    # Merge destination-airport market structure onto flights.
-    flights_df = flights_df.merge(
-        market_dest,
-        how="left",
-        on=["dest_airport_id", "year", "month"],
-    )
-
-    return flights_df
-
+    return [(market, ["{side}_airport_id", "year", "month"])]
 
 
-def misspecification_test(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+def add_market_structure(flights_df: pd.DataFrame, conn: sqlite3.Connection) -> pd.DataFrame:
     """
-    Add additional airline-airport market structure variables used for misspecification tests.
+    Add airport-level market structure measures (hub size and HHI) for both origin and destination.
 
-    This function merges (airline, airport, year, month)-level variables onto the flight-level data
-    for both the origin and destination airports. The added variables include market share terms,
-    squared terms, HHI-minus terms, and lagged versions (as available in the source tables).
+    Origin measures are merged by (origin_airport_id, year, month) and destination measures by
+    (dest_airport_id, year, month); see `market_structure_lookups`.
 
     Parameters
     ----------
     flights_df : pd.DataFrame
-        Flight-level data containing merge keys:
-        ['origin_airport_id', 'dest_airport_id', 'dot_id_reporting_airline', 'year', 'month'].
-    db_source : str
-        Path to the SQLite database.
+        Flight-level data containing at least:
+        ['origin_airport_id', 'dest_airport_id', 'year', 'month'].
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
 
     Returns
     -------
     pd.DataFrame
-        flights_df with additional origin- and destination-side misspecification-test variables.
+        flights_df with additional columns for origin and destination market structure.
+    """
+    return merge_lookups(flights_df, market_structure_lookups(conn))
+
+
+def misspecification_test_lookups(
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> list[Lookup]:
+    """
+    Load airline-airport market structure variables used for misspecification tests.
+
+    The variables are keyed by (airline, airport, year, month) and returned as one lookup with
+    "{side}" placeholders, joined by `merge_lookups` on both the origin and the destination
+    airport. They include market
+    share terms, squared terms, HHI-minus terms, and lagged versions (as available in the
+    source tables).
+
+    Only airports in `airports_to_analyze` are loaded (filtered in SQL); flights on other
+    airports are dropped by the sample selection and could never match.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str, optional
+        Path to the SQLite database; together with `cache_dir` it enables the Parquet cache
+        (see `read_sql_cached`).
+    cache_dir : str or Path, optional
+        Directory holding the Parquet cache files.
+
+    Returns
+    -------
+    list of (pd.DataFrame, list[str])
+        A "{side}"-templated lookup and its join keys, for use with `merge_lookups`.
     """
     # Load airline-airport market share and hub-size information (origin-side keys).
-    with sqlite3.connect(db_source) as conn:
-        airline_market_origin = pd.read_sql_query(
-            """
-            SELECT
-                OriginAirportID          AS origin_airport_id,
-                DOT_ID_Reporting_Airline AS dot_id_reporting_airline,
-                Year                     AS year,
-                Month                    AS month,
-                HubSize                  AS airline_hub_size_origin
-            FROM airport_airline_market_info
-            """,
-            conn,
-        )
+    airline_market_origin = read_sql_cached(
+        "airport_airline_market_info",
+        """
+        SELECT
+            OriginAirportID          AS origin_airport_id,
+            DOT_ID_Reporting_Airline AS dot_id_reporting_airline,
+            Year                     AS year,
+            Month                    AS month,
+            HubSize                  AS airline_hub_size_origin
+        FROM airport_airline_market_info
+        WHERE OriginAirportID IN (SELECT OriginAirportID FROM airports_to_analyze)
+        """,
+        conn,
+        db_source,
+        cache_dir,
+    )
 
-        # Load additional market structure measures (including squared and lagged terms).
-        airline_market_structure = pd.read_sql_query(
-            """
-            SELECT
-                OriginAirportID          AS origin_airport_id,
-                DOT_ID_Reporting_Airline AS dot_id_reporting_airline,
-                Year                     AS year,
-                Month                    AS month,
-                market_share             AS market_share_origin,
-                market_share_squared     AS market_share_squared_origin,
-                HHIminus                 AS hhi_minus_origin,
-                market_share_lagged      AS market_share_origin_lagged,
-                market_share_squared_lagged AS market_share_squared_origin_lagged,
-                HHI_minus_lagged         AS hhi_minus_origin_lagged
-            FROM new_market_share
-            """,
-            conn,
-        )
+    # Load additional market structure measures (including squared and lagged terms).
+    airline_market_structure = read_sql_cached(
+        "new_market_share",
+        """
+        SELECT
+            OriginAirportID          AS origin_airport_id,
+            DOT_ID_Reporting_Airline AS dot_id_reporting_airline,
+            Year                     AS year,
+            Month                    AS month,
+            market_share             AS market_share_origin,
+            market_share_squared     AS market_share_squared_origin,
+            HHIminus                 AS hhi_minus_origin,
+            market_share_lagged      AS market_share_origin_lagged,
+            market_share_squared_lagged AS market_share_squared_origin_lagged,
+            HHI_minus_lagged         AS hhi_minus_origin_lagged
+        FROM new_market_share
+        WHERE OriginAirportID IN (SELECT OriginAirportID FROM airports_to_analyze)
+        """,
+        conn,
+        db_source,
+        cache_dir,
+    )
 
     # Combine the two origin-side tables into a single (airline, origin_airport, year, month) table.
     airline_market_origin = airline_market_origin.merge(
@@ -465,204 +952,210 @@ def misspecification_test(flights_df: pd.DataFrame, db_source: str) -> pd.DataFr
         how="inner",
     )
 
-    # Merge origin-side measures onto flights.
-    flights_df = flights_df.merge(
-        airline_market_origin,
-        how="left",
-        on=["origin_airport_id", "dot_id_reporting_airline", "year", "month"],
-    )
-
-    # Reuse the same measures for destination by renaming origin columns to destination columns.
-    airline_market_destination = airline_market_origin.rename(
+    # Template the airport-side names so the same table serves origin and destination.
+    airline_market = airline_market_origin.rename(
         columns={
-            "origin_airport_id": "dest_airport_id",
-            "market_share_origin": "market_share_dest",
-            "market_share_squared_origin": "market_share_squared_dest",
-            "hhi_minus_origin": "hhi_minus_dest",
-            "airline_hub_size_origin": "airline_hub_size_dest",
-            "market_share_origin_lagged": "market_share_dest_lagged",
-            "market_share_squared_origin_lagged": "market_share_squared_dest_lagged",
-            "hhi_minus_origin_lagged": "hhi_minus_dest_lagged",
+            "origin_airport_id": "{side}_airport_id",
+            "airline_hub_size_origin": "airline_hub_size_{side}",
+            "market_share_origin": "market_share_{side}",
+            "market_share_squared_origin": "market_share_squared_{side}",
+            "hhi_minus_origin": "hhi_minus_{side}",
+            "market_share_origin_lagged": "market_share_{side}_lagged",
+            "market_share_squared_origin_lagged": "market_share_squared_{side}_lagged",
+            "hhi_minus_origin_lagged": "hhi_minus_{side}_lagged",
         }
     )
 
-    # Merge destination-side measures onto flights.
-    flights_df = flights_df.merge(
-        airline_market_destination,
-        how="left",
-        on=["dest_airport_id", "dot_id_reporting_airline", "year", "month"],
-    )
+    return [(airline_market, ["{side}_airport_id", "dot_id_reporting_airline", "year", "month"])]
 
-    return flights_df
 
+def misspecification_test(flights_df: pd.DataFrame, conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Add additional airline-airport market structure variables used for misspecification tests.
+
+    Origin- and destination-side variables are merged by (airport, airline, year, month);
+    see `misspecification_test_lookups`.
+
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Flight-level data containing merge keys:
+        ['origin_airport_id', 'dest_airport_id', 'dot_id_reporting_airline', 'year', 'month'].
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
 
-def add_metro_level_statistics(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+    Returns
+    -------
+    pd.DataFrame
+        flights_df with additional origin- and destination-side misspecification-test variables.
     """
-    Add metro-area population and GDP-per-capita measures for both origin and destination airports.
+    return merge_lookups(flights_df, misspecification_test_lookups(conn))
+
+
+def metro_level_tables(
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> tuple[pd.Index, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load metro-area population and GDP-per-capita measures as dense airport x year tables.
 
     The CBSA table is stored in wide format (separate columns for each year). This function:
       1) Loads CBSA population and GDP columns from SQLite.
-      2) Reshapes GDP and population to long format by year.
+      2) Takes the 2001-2019 GDP and population columns directly as (airport, year) arrays.
       3) Computes GDP per capita (GDP / population).
       4) Fills missing GDP-per-capita values by imputing the mean within each year (across airports).
-      5) Merges metro population and GDP-per-capita onto flights by (airport_id, year) for origin
-         and again for destination.
+      5) Returns metro population and GDP per capita as 2-D arrays indexed by [airport, year].
 
     Notes
     -----
     - The imputation step is intended to avoid missing values in downstream regressions.
-    - The function assumes that GDP and population series align by (origin_airport_id, year)
-      after melting; this holds given consistent construction of the wide CBSA table.
+    - Each CBSA row must be a distinct airport; a ValueError is raised otherwise.
 
     Parameters
     ----------
-    flights_df : pd.DataFrame
-        Flight-level data containing at least:
-        ['origin_airport_id', 'dest_airport_id', 'year'].
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str, optional
+        Path to the SQLite database; together with `cache_dir` it enables the Parquet cache
+        (see `read_sql_cached`).
+    cache_dir : str or Path, optional
+        Directory holding the Parquet cache files.
 
     Returns
     -------
-    pd.DataFrame
-        flights_df with added columns:
-        metro_pop_origin, metro_gdp_capita_origin, metro_pop_dest, metro_gdp_capita_dest.
+    (airports, years, metro_pop, metro_gdp_capita) : tuple
+        airports is an Index of airport ids (one per row) and years an array of years (one per
+        column); metro_pop and metro_gdp_capita have shape (len(airports), len(years)).
     """
     # Load CBSA table (wide format with year-specific columns).
-    with sqlite3.connect(db_source) as conn:
-        cbsa = pd.read_sql_query(
-            """
-            SELECT
-                airport_id AS origin_airport_id,
-                gdp_missing,
-                POPESTIMATE2000 AS pop_estimate_2000,
-                POPESTIMATE2001 AS pop_estimate_2001,
-                POPESTIMATE2002 AS pop_estimate_2002,
-                POPESTIMATE2003 AS pop_estimate_2003,
-                POPESTIMATE2004 AS pop_estimate_2004,
-                POPESTIMATE2005 AS pop_estimate_2005,
-                POPESTIMATE2006 AS pop_estimate_2006,
-                POPESTIMATE2007 AS pop_estimate_2007,
-                POPESTIMATE2008 AS pop_estimate_2008,
-                POPESTIMATE2009 AS pop_estimate_2009,
-                POPESTIMATE2010 AS pop_estimate_2010,
-                POPESTIMATE2011 AS pop_estimate_2011,
-                POPESTIMATE2012 AS pop_estimate_2012,
-                POPESTIMATE2013 AS pop_estimate_2013,
-                POPESTIMATE2014 AS pop_estimate_2014,
-                POPESTIMATE2015 AS pop_estimate_2015,
-                POPESTIMATE2016 AS pop_estimate_2016,
-                POPESTIMATE2017 AS pop_estimate_2017,
-                POPESTIMATE2018 AS pop_estimate_2018,
-                POPESTIMATE2019 AS pop_estimate_2019,
-                gdp_2001,
-                gdp_2002,
-                gdp_2003,
-                gdp_2004,
-                gdp_2005,
-                gdp_2006,
-                gdp_2007,
-                gdp_2008,
-                gdp_2009,
-                gdp_2010,
-                gdp_2011,
-                gdp_2012,
-                gdp_2013,
-                gdp_2014,
-                gdp_2015,
-                gdp_2016,
-                gdp_2017,
-                gdp_2018,
-                gdp_2019
-            FROM cbsa
-            """,
-            conn,
-        )
-
-    # --- GDP: wide -> long (origin_airport_id, year, MetroGDP) ---
-    cbsa_gdp = cbsa[
-        [
-            "origin_airport_id",
-            "gdp_2001", "gdp_2002", "gdp_2003", "gdp_2004",
-            "gdp_2005", "gdp_2006", "gdp_2007", "gdp_2008", "gdp_2009", "gdp_2010",
-            "gdp_2011", "gdp_2012", "gdp_2013", "gdp_2014", "gdp_2015", "gdp_2016",
-            "gdp_2017", "gdp_2018", "gdp_2019",
-        ]
-    ]
-    cbsa_gdp = pd.melt(
-        cbsa_gdp,
-        id_vars=["origin_airport_id"],
-        value_vars=[
-            "gdp_2001", "gdp_2002", "gdp_2003", "gdp_2004",
-            "gdp_2005", "gdp_2006", "gdp_2007", "gdp_2008", "gdp_2009", "gdp_2010",
-            "gdp_2011", "gdp_2012", "gdp_2013", "gdp_2014", "gdp_2015", "gdp_2016",
-            "gdp_2017", "gdp_2018", "gdp_2019",
-        ],
-        var_name="year",
-        value_name="metro_gdp",
+    cbsa = read_sql_cached(
+        "cbsa",
+        """
+        SELECT
+            airport_id AS origin_airport_id,
+            gdp_missing,
+            POPESTIMATE2000 AS pop_estimate_2000,
+            POPESTIMATE2001 AS pop_estimate_2001,
+            POPESTIMATE2002 AS pop_estimate_2002,
+            POPESTIMATE2003 AS pop_estimate_2003,
+            POPESTIMATE2004 AS pop_estimate_2004,
+            POPESTIMATE2005 AS pop_estimate_2005,
+            POPESTIMATE2006 AS pop_estimate_2006,
+            POPESTIMATE2007 AS pop_estimate_2007,
+            POPESTIMATE2008 AS pop_estimate_2008,
+            POPESTIMATE2009 AS pop_estimate_2009,
+            POPESTIMATE2010 AS pop_estimate_2010,
+            POPESTIMATE2011 AS pop_estimate_2011,
+            POPESTIMATE2012 AS pop_estimate_2012,
+            POPESTIMATE2013 AS pop_estimate_2013,
+            POPESTIMATE2014 AS pop_estimate_2014,
+            POPESTIMATE2015 AS pop_estimate_2015,
+            POPESTIMATE2016 AS pop_estimate_2016,
+            POPESTIMATE2017 AS pop_estimate_2017,
+            POPESTIMATE2018 AS pop_estimate_2018,
+            POPESTIMATE2019 AS pop_estimate_2019,
+            gdp_2001,
+            gdp_2002,
+            gdp_2003,
+            gdp_2004,
+            gdp_2005,
+            gdp_2006,
+            gdp_2007,
+            gdp_2008,
+            gdp_2009,
+            gdp_2010,
+            gdp_2011,
+            gdp_2012,
+            gdp_2013,
+            gdp_2014,
+            gdp_2015,
+            gdp_2016,
+            gdp_2017,
+            gdp_2018,
+            gdp_2019
+        FROM cbsa
+        """,
+        conn,
+        db_source,
+        cache_dir,
     )
-    cbsa_gdp["year"] = cbsa_gdp["year"].str[-4:].astype(int)
 
-    # --- Population: wide -> long (origin_airport_id, year, metro_pop) ---
-    cbsa_pop = cbsa[
-        [
-            "origin_airport_id",
-            "pop_estimate_2000",
-            "pop_estimate_2001", "pop_estimate_2002", "pop_estimate_2003",
-            "pop_estimate_2004", "pop_estimate_2005", "pop_estimate_2006",
-            "pop_estimate_2007", "pop_estimate_2008", "pop_estimate_2009",
-            "pop_estimate_2010", "pop_estimate_2011", "pop_estimate_2012",
-            "pop_estimate_2013", "pop_estimate_2014", "pop_estimate_2015",
-            "pop_estimate_2016", "pop_estimate_2017", "pop_estimate_2018",
-            "pop_estimate_2019",
-        ]
-    ]
-    cbsa_pop = pd.melt(
-        cbsa_pop,
-        id_vars=["origin_airport_id"],
-        value_vars=[
-            "pop_estimate_2001", "pop_estimate_2002", "pop_estimate_2003",
-            "pop_estimate_2004", "pop_estimate_2005", "pop_estimate_2006", "pop_estimate_2007",
-            "pop_estimate_2008", "pop_estimate_2009", "pop_estimate_2010", "pop_estimate_2011",
-            "pop_estimate_2012", "pop_estimate_2013", "pop_estimate_2014", "pop_estimate_2015",
-            "pop_estimate_2016", "pop_estimate_2017", "pop_estimate_2018", "pop_estimate_2019",
-        ],
-        var_name="year",
-        value_name="metro_pop",
+    airports = pd.Index(cbsa["origin_airport_id"])
+    if not airports.is_unique:
+        raise ValueError("cbsa table has more than one row for some airport_id")
+
+    # The wide columns already form (airport, year) tables; no reshaping needed.
+    years = np.arange(2001, 2020)
+    metro_pop = cbsa[[f"pop_estimate_{year}" for year in years]].to_numpy()
+    metro_gdp = cbsa[[f"gdp_{year}" for year in years]].to_numpy()
+
+    # Compute GDP per capita.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gdp_capita = metro_gdp / metro_pop
+
+    # Impute missing GDP per capita with the mean across airports in the same year. The 19 means
+    # are computed on the year-major values (airports in table order), which keeps the summation
+    # order, and hence the imputed values, identical to the original long-format groupby; they
+    # are then broadcast into the gaps.
+    year_means = (
+        pd.Series(gdp_capita.T.ravel())
+        .groupby(np.repeat(np.arange(len(years)), len(airports)))
+        .mean()
+        .to_numpy()
     )
+    gdp_capita = np.where(np.isnan(gdp_capita), year_means[None, :], gdp_capita)
 
-    cbsa_pop["year"] = cbsa_pop["year"].str[-4:].astype(int)
+    return airports, years, metro_pop, gdp_capita
 
-    # Compute GDP per capita (relies on both long tables being aligned by airport-year).
 
-    cbsa_gdp = cbsa_gdp.merge(cbsa_pop, on=['origin_airport_id', 'year'], how='left')
-    cbsa_gdp['gdp_capita'] = cbsa_gdp['metro_gdp'] / cbsa_gdp['metro_pop']
+def add_metro_level_statistics(
+    flights_df: pd.DataFrame,
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> pd.DataFrame:
+    """
+    Add metro-area population and GDP-per-capita measures for both origin and destination airports.
 
-    cbsa_gdp['gdp_capita'] = cbsa_gdp["gdp_capita"] = cbsa_gdp["gdp_capita"].fillna(
-        cbsa_gdp.groupby("year")["gdp_capita"].transform("mean")
-    )
+    Instead of two hash joins on (airport_id, year), each flight's airport and year are mapped
+    to row/column positions in the dense tables from `metro_level_tables` and both measures are
+    gathered with one fancy index per side. Flights without a match get missing values, as with
+    a left join.
 
-    cbsa_gdp = (
-        cbsa_gdp[['origin_airport_id', 'year', 'metro_pop', 'gdp_capita']]
-            .rename(columns={
-                "gdp_capita": "metro_gdp_capita_origin",
-                "metro_pop": "metro_pop_origin",
-            })
-    )
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Flight-level data containing at least:
+        ['origin_airport_id', 'dest_airport_id', 'year'].
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source, cache_dir : optional
+        Passed to `metro_level_tables` to cache the CBSA table as Parquet.
+
+    Returns
+    -------
+    pd.DataFrame
+        flights_df with added columns:
+        metro_pop_origin, metro_gdp_capita_origin, metro_pop_dest, metro_gdp_capita_dest.
+    """
+    airports, years, metro_pop, metro_gdp_capita = metro_level_tables(conn, db_source, cache_dir)
 
-    flights_df = flights_df.merge(cbsa_gdp, how="left", on=["origin_airport_id", "year"])
+    cols = pd.Index(years).get_indexer(flights_df["year"].to_numpy())
 
-    # Merge the same variables for destination airport by renaming IDs/columns.
-    cbsa_gdp = cbsa_gdp.rename(
-        columns={
-            "origin_airport_id": "dest_airport_id",
-            "metro_pop_origin": "metro_pop_dest",
-            "metro_gdp_capita_origin": "metro_gdp_capita_dest",
-        }
-    )
-    flights_df = flights_df.merge(cbsa_gdp, how="left", on=["dest_airport_id", "year"])
+    metro = {}
+    for side in ("origin", "dest"):
+        rows = airports.get_indexer(flights_df[f"{side}_airport_id"].to_numpy())
+        found = (rows >= 0) & (cols >= 0)
 
-    return flights_df
+        for name, table in (("metro_pop", metro_pop), ("metro_gdp_capita", metro_gdp_capita)):
+            values = table[rows, cols]
+            if not found.all():
+                values = values.astype(np.float64)
+                values[~found] = np.nan
+            metro[f"{name}_{side}"] = values
+
+    return pd.concat([flights_df, pd.DataFrame(metro, index=flights_df.index)], axis=1)
 
 
 def get_depart_datetime(flights_df: pd.DataFrame) -> pd.DataFrame:
@@ -689,27 +1182,28 @@ def get_depart_datetime(flights_df: pd.DataFrame) -> pd.DataFrame:
         errors="coerce",
     )
 
-    # Parse scheduled departure time as HHMM, padding with leading zeros (e.g., 5 -> "0005").
-    t_num = pd.to_numeric(flights_df["crs_dep_time"], errors="coerce")
-    t_str = t_num.astype("Int64").astype("string").str.zfill(4)
-
-    # Split HHMM into hours and minutes.
-    hh = pd.to_numeric(t_str.str.slice(0, 2), errors="coerce")
-    mm = pd.to_numeric(t_str.str.slice(2, 4), errors="coerce")
+    # Split scheduled departure time (HHMM, e.g. 5 -> 00:05, 1230 -> 12:30) with integer
+    # arithmetic; NA times propagate to NaT.
+    t_num = pd.to_numeric(flights_df["crs_dep_time"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    minutes = np.floor_divide(t_num, 100) * 60 + np.mod(t_num, 100)
 
     # Combine date + time into a single datetime.
-    flights_df["DateTime"] = date + pd.to_timedelta(hh, unit="h") + pd.to_timedelta(mm, unit="m")
+    flights_df["DateTime"] = date.to_numpy() + pd.to_timedelta(minutes, unit="m").to_numpy()
 
     return flights_df
 
 
 
+# Hub-size levels (categories 0-3), in the order used for dummy and interaction column names.
+HUB_LEVELS = ("non_hub", "small_hub", "medium_hub", "large_hub")
+
+
 def add_husize_dummies(flights_df: pd.DataFrame) -> pd.DataFrame:
     """
     Create hub-size dummy variables for airport and airline hub categories.
 
-    The input columns contain integer hub-size categories (e.g., 0–3). This function converts
-    them into one-hot indicator columns for:
+    The input columns contain integer hub-size categories (0–3). This function converts
+    them into one-hot int8 indicator columns (all four levels are always created) for:
       - airport hub size at origin and destination
       - airline hub size at origin and destination
 
@@ -724,60 +1218,71 @@ def add_husize_dummies(flights_df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         flights_df with additional dummy columns appended.
     """
-    # One-hot encode hub-size categories and rename to readable indicator names.
-    airport_origin = (
-        pd.get_dummies(flights_df["airport_hub_size_origin"]).astype('Int8')
-        .rename(
-            columns={
-                0: "non_hub_airport_origin",
-                1: "small_hub_airport_origin",
-                2: "medium_hub_airport_origin",
-                3: "large_hub_airport_origin",
-            }
-        )
-    )
-
-    airline_origin = (
-        pd.get_dummies(flights_df["airline_hub_size_origin"]).astype('Int8')
-        .rename(
-            columns={
-                0: "non_hub_airline_origin",
-                1: "small_hub_airline_origin",
-                2: "medium_hub_airline_origin",
-                3: "large_hub_airline_origin",
-            }
-        )
-    )
+    # Hub-size category columns and the prefix of their indicator names.
+    hub_columns = [
+        ("airport_hub_size_origin", "airport_origin"),
+        ("airline_hub_size_origin", "airline_origin"),
+        ("airport_hub_size_dest", "airport_dest"),
+        ("airline_hub_size_dest", "airline_dest"),
+    ]
 
-    airport_dest = (
-        pd.get_dummies(flights_df["airport_hub_size_dest"]).astype('Int8')
-        .rename(
-            columns={
-                0: "non_hub_airport_dest",
-                1: "small_hub_airport_dest",
-                2: "medium_hub_airport_dest",
-                3: "large_hub_airport_dest",
-            }
-        )
-    )
+    # One broadcast comparison against the category codes yields every indicator at once;
+    # missing categories give all-zero rows, as with get_dummies. Plain int8 (no NA mask) is
+    # enough since every row gets a 0/1 value.
+    codes = flights_df[[col for col, _ in hub_columns]].to_numpy(dtype=np.float64, na_value=np.nan)
+    levels = np.arange(len(HUB_LEVELS))
+    dummies = (codes[:, :, None] == levels[None, None, :]).view(np.int8).reshape(len(flights_df), -1)
 
-    airline_dest = (
-        pd.get_dummies(flights_df["airline_hub_size_dest"]).astype('Int8')
-        .rename(
-            columns={
-                0: "non_hub_airline_dest",
-                1: "small_hub_airline_dest",
-                2: "medium_hub_airline_dest",
-                3: "large_hub_airline_dest",
-            }
-        )
-    )
+    names = [f"{level}_{suffix}" for _, suffix in hub_columns for level in HUB_LEVELS]
+    dummies_df = pd.DataFrame(dummies, columns=names, index=flights_df.index, copy=False)
 
     # Append dummy columns to the main DataFrame.
-    flights_df = pd.concat([flights_df, airport_origin, airline_origin, airport_dest, airline_dest], axis=1)
+    flights_df = pd.concat([flights_df, dummies_df], axis=1)
     return flights_df
 
 
+def _hub_interactions(
+    flights_df: pd.DataFrame,
+    measures: list[tuple[str, str]],
+    prefix: str = "",
+) -> pd.DataFrame:
+    """
+    Multiply airline hub-size dummies by market-structure measures for origin and destination.
+
+    Each measure is given as (label, column template), where the template contains `{side}`
+    (e.g. ("ms", "market_share_{side}")). Output columns are named
+    `{prefix}{level}_airline_{label}_{side}` and are ordered by measure, then side, then level.
+
+    All products are written into one preallocated float block, which is appended to
+    flights_df with a single concat instead of one column insertion per interaction. Each
+    product is a single broadcast multiply straight into `out`, so there are no temporaries
+    for `DataFrame.eval`/numexpr to fuse away.
+    """
+    sides = ("origin", "dest")
+    n_levels = len(HUB_LEVELS)
+
+    names = []
+    out = np.empty((len(flights_df), len(measures) * len(sides) * n_levels), dtype=np.float64)
+
+    # Dummy matrices are extracted once per side (as the stored int8 0/1 values, without a float
+    # copy) and reused for every measure; np.multiply promotes to float64 as it writes into `out`.
+    dummies = {
+        side: flights_df[[f"{level}_airline_{side}" for level in HUB_LEVELS]].to_numpy(dtype=np.int8)
+        for side in sides
+    }
+
+    col = 0
+    for label, template in measures:
+        for side in sides:
+            measure = flights_df[template.format(side=side)].to_numpy(dtype=np.float64, na_value=np.nan)
+            np.multiply(dummies[side], measure[:, None], out=out[:, col:col + n_levels])
+            names.extend(f"{prefix}{level}_airline_{label}_{side}" for level in HUB_LEVELS)
+            col += n_levels
+
+    interactions = pd.DataFrame(out, columns=names, index=flights_df.index, copy=False)
+    return pd.concat([flights_df, interactions], axis=1)
+
+
 def add_hubsize_interactions(flights_df: pd.DataFrame) -> pd.DataFrame:
     """
     Create interaction variables between airline hub-size dummies and market-structure measures.
@@ -800,59 +1305,15 @@ def add_hubsize_interactions(flights_df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         flights_df with added interaction columns.
     """
-    # ---- Market share interactions ----
-    # Origin
-    flights_df["non_hub_airline_ms_origin"] = flights_df["non_hub_airline_origin"] * flights_df["market_share_origin"]
-    flights_df["small_hub_airline_ms_origin"] = flights_df["small_hub_airline_origin"] * flights_df["market_share_origin"]
-    flights_df["medium_hub_airline_ms_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["market_share_origin"]
-    flights_df["large_hub_airline_ms_origin"] = flights_df["large_hub_airline_origin"] * flights_df["market_share_origin"]
-
-    # Destination
-    flights_df["non_hub_airline_ms_dest"] = flights_df["non_hub_airline_dest"] * flights_df["market_share_dest"]
-    flights_df["small_hub_airline_ms_dest"] = flights_df["small_hub_airline_dest"] * flights_df["market_share_dest"]
-    flights_df["medium_hub_airline_ms_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["market_share_dest"]
-    flights_df["large_hub_airline_ms_dest"] = flights_df["large_hub_airline_dest"] * flights_df["market_share_dest"]
-
-    # ---- HHI (market concentration) interactions ----
-    # Origin
-    flights_df["non_hub_airline_hhi_origin"] = flights_df["non_hub_airline_origin"] * flights_df["hhi_origin"]
-    flights_df["small_hub_airline_hhi_origin"] = flights_df["small_hub_airline_origin"] * flights_df["hhi_origin"]
-    flights_df["medium_hub_airline_hhi_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["hhi_origin"]
-    flights_df["large_hub_airline_hhi_origin"] = flights_df["large_hub_airline_origin"] * flights_df["hhi_origin"]
-
-    # Destination
-    flights_df["non_hub_airline_hhi_dest"] = flights_df["non_hub_airline_dest"] * flights_df["hhi_dest"]
-    flights_df["small_hub_airline_hhi_dest"] = flights_df["small_hub_airline_dest"] * flights_df["hhi_dest"]
-    flights_df["medium_hub_airline_hhi_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["hhi_dest"]
-    flights_df["large_hub_airline_hhi_dest"] = flights_df["large_hub_airline_dest"] * flights_df["hhi_dest"]
-
-    # ---- Market share squared interactions (misspecification tests) ----
-    # Origin
-    flights_df["non_hub_airline_ms2_origin"] = flights_df["non_hub_airline_origin"] * flights_df["market_share_squared_origin"]
-    flights_df["small_hub_airline_ms2_origin"] = flights_df["small_hub_airline_origin"] * flights_df["market_share_squared_origin"]
-    flights_df["medium_hub_airline_ms2_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["market_share_squared_origin"]
-    flights_df["large_hub_airline_ms2_origin"] = flights_df["large_hub_airline_origin"] * flights_df["market_share_squared_origin"]
-
-    # Destination
-    flights_df["non_hub_airline_ms2_dest"] = flights_df["non_hub_airline_dest"] * flights_df["market_share_squared_dest"]
-    flights_df["small_hub_airline_ms2_dest"] = flights_df["small_hub_airline_dest"] * flights_df["market_share_squared_dest"]
-    flights_df["medium_hub_airline_ms2_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["market_share_squared_dest"]
-    flights_df["large_hub_airline_ms2_dest"] = flights_df["large_hub_airline_dest"] * flights_df["market_share_squared_dest"]
-
-    # ---- Residual concentration interactions (HHI minus own-share component) ----
-    # Origin
-    flights_df["non_hub_airline_hhi_minus_origin"] = flights_df["non_hub_airline_origin"] * flights_df["hhi_minus_origin"]
-    flights_df["small_hub_airline_hhi_minus_origin"] = flights_df["small_hub_airline_origin"] * flights_df["hhi_minus_origin"]
-    flights_df["medium_hub_airline_hhi_minus_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["hhi_minus_origin"]
-    flights_df["large_hub_airline_hhi_minus_origin"] = flights_df["large_hub_airline_origin"] * flights_df["hhi_minus_origin"]
-
-    # Destination
-    flights_df["non_hub_airline_hhi_minus_dest"] = flights_df["non_hub_airline_dest"] * flights_df["hhi_minus_dest"]
-    flights_df["small_hub_airline_hhi_minus_dest"] = flights_df["small_hub_airline_dest"] * flights_df["hhi_minus_dest"]
-    flights_df["medium_hub_airline_hhi_minus_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["hhi_minus_dest"]
-    flights_df["large_hub_airline_hhi_minus_dest"] = flights_df["large_hub_airline_dest"] * flights_df["hhi_minus_dest"]
-
-    return flights_df
+    return _hub_interactions(
+        flights_df,
+        [
+            ("ms", "market_share_{side}"),
+            ("hhi", "hhi_{side}"),
+            ("ms2", "market_share_squared_{side}"),  # misspecification tests
+            ("hhi_minus", "hhi_minus_{side}"),       # HHI minus own-share component
+        ],
+    )
 
 
 def add_lagged_hubsize_interactions(flights_df: pd.DataFrame) -> pd.DataFrame:
@@ -877,63 +1338,20 @@ def add_lagged_hubsize_interactions(flights_df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         flights_df with added lagged interaction columns.
     """
-    # ---- Lagged market share interactions ----
-    # Origin
-    flights_df["l_non_hub_airline_ms_origin"] = flights_df["non_hub_airline_origin"] * flights_df["market_share_origin_lagged"]
-    flights_df["l_small_hub_airline_ms_origin"] = flights_df["small_hub_airline_origin"] * flights_df["market_share_origin_lagged"]
-    flights_df["l_medium_hub_airline_ms_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["market_share_origin_lagged"]
-    flights_df["l_large_hub_airline_ms_origin"] = flights_df["large_hub_airline_origin"] * flights_df["market_share_origin_lagged"]
-
-    # Destination
-    flights_df["l_non_hub_airline_ms_dest"] = flights_df["non_hub_airline_dest"] * flights_df["market_share_dest_lagged"]
-    flights_df["l_small_hub_airline_ms_dest"] = flights_df["small_hub_airline_dest"] * flights_df["market_share_dest_lagged"]
-    flights_df["l_medium_hub_airline_ms_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["market_share_dest_lagged"]
-    flights_df["l_large_hub_airline_ms_dest"] = flights_df["large_hub_airline_dest"] * flights_df["market_share_dest_lagged"]
-
-    # ---- Lagged HHI (market concentration) interactions ----
-    # Origin
-    flights_df["l_non_hub_airline_hhi_origin"] = flights_df["non_hub_airline_origin"] * flights_df["hhi_origin_lagged"]
-    flights_df["l_small_hub_airline_hhi_origin"] = flights_df["small_hub_airline_origin"] * flights_df["hhi_origin_lagged"]
-    flights_df["l_medium_hub_airline_hhi_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["hhi_origin_lagged"]
-    flights_df["l_large_hub_airline_hhi_origin"] = flights_df["large_hub_airline_origin"] * flights_df["hhi_origin_lagged"]
-
-    # Destination
-    flights_df["l_non_hub_airline_hhi_dest"] = flights_df["non_hub_airline_dest"] * flights_df["hhi_dest_lagged"]
-    flights_df["l_small_hub_airline_hhi_dest"] = flights_df["small_hub_airline_dest"] * flights_df["hhi_dest_lagged"]
-    flights_df["l_medium_hub_airline_hhi_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["hhi_dest_lagged"]
-    flights_df["l_large_hub_airline_hhi_dest"] = flights_df["large_hub_airline_dest"] * flights_df["hhi_dest_lagged"]
-
-    # ---- Lagged market share squared interactions (misspecification tests) ----
-    # Origin
-    flights_df["l_non_hub_airline_ms2_origin"] = flights_df["non_hub_airline_origin"] * flights_df["market_share_squared_origin_lagged"]
-    flights_df["l_small_hub_airline_ms2_origin"] = flights_df["small_hub_airline_origin"] * flights_df["market_share_squared_origin_lagged"]
-    flights_df["l_medium_hub_airline_ms2_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["market_share_squared_origin_lagged"]
-    flights_df["l_large_hub_airline_ms2_origin"] = flights_df["large_hub_airline_origin"] * flights_df["market_share_squared_origin_lagged"]
-
-    # Destination
-    flights_df["l_non_hub_airline_ms2_dest"] = flights_df["non_hub_airline_dest"] * flights_df["market_share_squared_dest_lagged"]
-    flights_df["l_small_hub_airline_ms2_dest"] = flights_df["small_hub_airline_dest"] * flights_df["market_share_squared_dest_lagged"]
-    flights_df["l_medium_hub_airline_ms2_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["market_share_squared_dest_lagged"]
-    flights_df["l_large_hub_airline_ms2_dest"] = flights_df["large_hub_airline_dest"] * flights_df["market_share_squared_dest_lagged"]
-
-    # ---- Lagged residual concentration interactions (HHI minus) ----
-    # Origin
-    flights_df["l_non_hub_airline_hhi_minus_origin"] = flights_df["non_hub_airline_origin"] * flights_df["hhi_minus_origin_lagged"]
-    flights_df["l_small_hub_airline_hhi_minus_origin"] = flights_df["small_hub_airline_origin"] * flights_df["hhi_minus_origin_lagged"]
-    flights_df["l_medium_hub_airline_hhi_minus_origin"] = flights_df["medium_hub_airline_origin"] * flights_df["hhi_minus_origin_lagged"]
-    flights_df["l_large_hub_airline_hhi_minus_origin"] = flights_df["large_hub_airline_origin"] * flights_df["hhi_minus_origin_lagged"]
-
-    # Destination
-    flights_df["l_non_hub_airline_hhi_minus_dest"] = flights_df["non_hub_airline_dest"] * flights_df["hhi_minus_dest_lagged"]
-    flights_df["l_small_hub_airline_hhi_minus_dest"] = flights_df["small_hub_airline_dest"] * flights_df["hhi_minus_dest_lagged"]
-    flights_df["l_medium_hub_airline_hhi_minus_dest"] = flights_df["medium_hub_airline_dest"] * flights_df["hhi_minus_dest_lagged"]
-    flights_df["l_large_hub_airline_hhi_minus_dest"] = flights_df["large_hub_airline_dest"] * flights_df["hhi_minus_dest_lagged"]
-
-    return flights_df
+    return _hub_interactions(
+        flights_df,
+        [
+            ("ms", "market_share_{side}_lagged"),
+            ("hhi", "hhi_{side}_lagged"),
+            ("ms2", "market_share_squared_{side}_lagged"),
+            ("hhi_minus", "hhi_minus_{side}_lagged"),
+        ],
+        prefix="l_",
+    )
 
 
 
-def create_merger_ids(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+def create_merger_ids(flights_df: pd.DataFrame, conn: sqlite3.Connection) -> pd.DataFrame:
     """
     Create post-merger airline identifiers by collapsing merged carriers after a cutoff date.
 
@@ -950,8 +1368,8 @@ def create_merger_ids(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
     ----------
     flights_df : pd.DataFrame
         Flight-level data containing at least: year, month, dot_id_reporting_airline.
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
 
     Returns
     -------
@@ -962,11 +1380,10 @@ def create_merger_ids(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
           - dot_id_reporting_airline overwritten with synthetic ids post-merger
     """
     # Load merger cutoff rules (sorted so later cutoffs are applied first).
-    with sqlite3.connect(db_source) as conn:
-        merger_cutoff = pd.read_sql_query(
-            "SELECT * FROM merger_cutoff ORDER BY -YearMonth",
-            conn,
-        )
+    merger_cutoff = pd.read_sql_query(
+        "SELECT * FROM merger_cutoff ORDER BY -YearMonth",
+        conn,
+    )
 
     # Construct a continuous YearMonth index to compare against merger cutoff dates.
     flights_df["YearMonth"] = flights_df["year"] + (flights_df["month"] - 1) / 12
@@ -974,130 +1391,213 @@ def create_merger_ids(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
     # Preserve the original carrier id before applying merger recodes.
     flights_df["uniquecarrier_old"] = flights_df["dot_id_reporting_airline"]
 
-    # Recode post-merger carrier ids to a synthetic id (unique per merger rule).
+    # The recode depends only on (carrier, year, month), so the rules are applied to the distinct
+    # carrier-months (a few thousand) and the result is mapped back to the flights in one take.
+    flight_ids = flights_df["dot_id_reporting_airline"].to_numpy()
+    month_index = flights_df["year"].to_numpy(dtype=np.int64) * 12 + flights_df["month"].to_numpy(dtype=np.int64) - 1
+    codes, uniques = pd.factorize((flight_ids.astype(np.int64) << 20) | month_index)
+
+    # Every flight of a carrier-month has the same id and YearMonth, so any write wins.
+    ids = np.empty(len(uniques), dtype=flight_ids.dtype)
+    ids[codes] = flight_ids
+    yearmonth = np.empty(len(uniques), dtype=np.float64)
+    yearmonth[codes] = flights_df["YearMonth"].to_numpy()
+
+    # Recode post-merger carrier ids to a synthetic id (unique per merger rule). Rules are
+    # applied in order on the current ids, so a carrier-month takes the first (latest-cutoff)
+    # rule that matches it.
     new_id = 99999
     for continue_id, merged_id, cutoff_yearmonth in zip(
-        merger_cutoff["Continue_Airline"],
-        merger_cutoff["Merged_Airline"],
-        merger_cutoff["YearMonth"],
+        merger_cutoff["Continue_Airline"].to_numpy(),
+        merger_cutoff["Merged_Airline"].to_numpy(),
+        merger_cutoff["YearMonth"].to_numpy(),
     ):
         # Flights by either carrier after the cutoff are treated as the merged entity.
-        replace_ind = (
-            flights_df["dot_id_reporting_airline"].isin([continue_id, merged_id])
-            & (flights_df["YearMonth"] > cutoff_yearmonth)
-        )
-        flights_df.loc[replace_ind, "dot_id_reporting_airline"] = new_id
+        replace_ind = ((ids == continue_id) | (ids == merged_id)) & (yearmonth > cutoff_yearmonth)
+        ids[replace_ind] = new_id
         new_id -= 1  # decrement to keep synthetic ids unique across merger rules
 
+    flights_df["dot_id_reporting_airline"] = ids[codes]
+
     return flights_df
 
 
-def analyze_weather(weather_name: str, db_source: str) -> pd.DataFrame:
+# Temperature-bin dummies, in bin order: right-closed 10-degree Celsius bins between -10 and 40,
+# with open-ended bins below and above.
+TEMPERATURE_DUMMIES = [
+    "temp_n_infty_n_10",
+    "temp_n_10_0",
+    "temp_0_10",
+    "temp_10_20",
+    "temp_20_30",
+    "temp_30_40",
+    "temp_40_infty",
+]
+
+
+def expand_temperature_dummies(weather_df: pd.DataFrame, column: str = "temp_bin") -> pd.DataFrame:
+    """
+    Replace the temperature-bin code column with one 0/1 dummy per bin.
+
+    Codes 0-6 index TEMPERATURE_DUMMIES and code 7 is an unbinned reading (all dummies 0). A
+    missing code (a flight with no matched weather) gives missing dummies.
+
+    Parameters
+    ----------
+    weather_df : pd.DataFrame
+        Frame holding the bin code produced by `analyze_weather`.
+    column : str, default "temp_bin"
+        Name of the bin-code column; it is dropped from the result.
+
+    Returns
+    -------
+    pd.DataFrame
+        weather_df with the code column replaced by the nullable Int8 dummies (appended as one
+        block, in TEMPERATURE_DUMMIES order).
+    """
+    codes = weather_df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(codes)
+    temp_block = pd.DataFrame(
+        {
+            name: pd.arrays.IntegerArray((codes == i).astype(np.int8), missing)
+            for i, name in enumerate(TEMPERATURE_DUMMIES)
+        },
+        index=weather_df.index,
+    )
+    return pd.concat([weather_df.drop(columns=column), temp_block], axis=1)
+
+
+def analyze_weather(
+    weather_name: str,
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> pd.DataFrame:
     """
     Load and clean hourly weather data for a single airport, and construct weather controls.
 
     This function reads from a per-airport table named `weather_{weather_name}` and produces:
       - precipitation indicators (rain/snow and trace variants, based on freezing threshold)
       - wind speed, wind speed squared, wind gust speed, and a gust dummy
-      - temperature bins in Celsius as a set of dummy variables
+      - the Celsius temperature bin of each reading, as the int8 code `temp_bin` (an index into
+        TEMPERATURE_DUMMIES; see `expand_temperature_dummies`)
+
+    With `db_source` and `cache_dir` given, the engineered frame is cached as
+    `{cache_dir}/weather_{weather_name}.parquet` and reused until the database changes.
 
     Parameters
     ----------
     weather_name : str
         Airport identifier suffix used in the table name `weather_{weather_name}`.
         (Typically an airport id consistent with flights_df['origin_airport_id'] grouping.)
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database.
+    db_source : str, optional
+        Path to the SQLite database (its modification time invalidates the cache).
+    cache_dir : str or Path, optional
+        Directory holding the Parquet cache files; None disables caching.
 
     Returns
     -------
     pd.DataFrame
-        Cleaned weather DataFrame with engineered variables, sorted by DateTime.
-    """
-    # Labels produced by `pd.cut(...).astype(str)` for the temperature bins below.
-    col_names = [
-        "(-100.001, -10.0]",
-        "(-10.0, 0.0]",
-        "(0.0, 10.0]",
-        "(10.0, 20.0]",
-        "(20.0, 30.0]",
-        "(30.0, 40.0]",
-        "(40.0, 100.0]",
-    ]
-    dummy_names = [
-        "temp_n_infty_n_10",
-        "temp_n_10_0",
-        "temp_0_10",
-        "temp_10_20",
-        "temp_20_30",
-        "temp_30_40",
-        "temp_40_infty",
-    ]
+        Cleaned weather DataFrame with engineered variables, sorted by DateTime (with a fresh
+        RangeIndex when read from the cache).
+    """
+    cache_path = None
+    if cache_dir is not None and db_source is not None:
+        cache_path = Path(cache_dir) / f"weather_{weather_name}.parquet"
+        if _cache_is_fresh(cache_path, db_source):
+            return pd.read_parquet(cache_path)
 
     # Load raw hourly weather data for this airport.
-    with sqlite3.connect(db_source) as conn:
-        weather_df = pd.read_sql_query(
-            f"""
-            SELECT
-                DATE AS DateTime,
-                HourlyDryBulbTemperature AS temperature,
-                HourlyPrecipitation AS precipitation,
-                Trace AS trace,
-                HourlyWindGustSpeed AS wind_gust_speed,
-                HourlyWindSpeed AS wind_speed
-            FROM weather_{weather_name}
-            """,
-            conn,
-        )
+    weather_df = pd.read_sql_query(
+        f"""
+        SELECT
+            CAST(strftime('%s', DATE) AS INTEGER) AS DateTime,
+            HourlyDryBulbTemperature AS temperature,
+            HourlyPrecipitation AS precipitation,
+            Trace AS trace,
+            IFNULL(HourlyWindGustSpeed, '0') AS wind_gust_speed,
+            HourlyWindSpeed AS wind_speed
+        FROM weather_{weather_name}
+        """,
+        conn,
+    )
 
-    # Ensure time ordering for merge_asof downstream.
-    weather_df["DateTime"] = pd.to_datetime(weather_df["DateTime"])
+    # SQLite converts the timestamps to epoch seconds while reading, so pandas only rescales
+    # integers instead of parsing one date string per row. Sorted for the as-of match downstream.
+    # strftime returns NULL for a DATE it cannot parse, so fail loudly (as pd.to_datetime did on
+    # the raw strings) rather than let NaT timestamps reach the as-of match.
+    n_unparsed = int(weather_df["DateTime"].isna().sum())
+    if n_unparsed:
+        raise ValueError(
+            f"weather_{weather_name} has {n_unparsed} DATE values that could not be parsed as timestamps."
+        )
+    weather_df["DateTime"] = pd.to_datetime(weather_df["DateTime"], unit="s")
     weather_df = weather_df.sort_values(by=["DateTime"])
 
-    # Precipitation type indicators: use 32F threshold to split rain vs snow.
+    # Precipitation type indicators: use 32F threshold to split rain vs snow. The boolean
+    # results are reinterpreted as int8 0/1 (a zero-copy view) rather than copied to int64.
     is_freezing = weather_df["temperature"] <= 32
-    weather_df["is_raining"] = (~is_freezing & (weather_df["precipitation"] > 0)).astype(int)
-    weather_df["is_snowing"] = (is_freezing & (weather_df["precipitation"] > 0)).astype(int)
-    weather_df["trace_rain"] = (~is_freezing & (weather_df["trace"])).astype(int)
-    weather_df["trace_snow"] = (is_freezing & (weather_df["trace"])).astype(int)
-
-    # Coerce numeric wind variables; treat missing gust as zero (no gust reported).
-    weather_df["wind_speed"] = pd.to_numeric(weather_df["wind_speed"], errors="coerce")
-    weather_df["wind_speed_squared"] = weather_df["wind_speed"] ** 2
-    weather_df["wind_gust_speed"] = pd.to_numeric(weather_df["wind_gust_speed"].fillna("0"), errors="coerce")
+    has_precipitation = weather_df["precipitation"] > 0
+    weather_df["is_raining"] = (~is_freezing & has_precipitation).to_numpy(dtype=bool).view(np.int8)
+    weather_df["is_snowing"] = (is_freezing & has_precipitation).to_numpy(dtype=bool).view(np.int8)
+    weather_df["trace_rain"] = (~is_freezing & weather_df["trace"]).to_numpy(dtype=bool).view(np.int8)
+    weather_df["trace_snow"] = (is_freezing & weather_df["trace"]).to_numpy(dtype=bool).view(np.int8)
+
+    # Coerce numeric wind variables; a missing gust is read as zero (no gust reported) by the
+    # IFNULL in the query. The coercion stays in pandas: unlike SQLite's CAST, which keeps the
+    # numeric prefix of a flagged value such as "12s", it turns anything non-numeric into NaN.
+    wind_speed = pd.to_numeric(weather_df["wind_speed"], errors="coerce").to_numpy(dtype=np.float64)
+    wind_gust_speed = pd.to_numeric(weather_df["wind_gust_speed"], errors="coerce").to_numpy(dtype=np.float64)
 
     # Drop rows missing key controls (keeps downstream regressors complete).
-    weather_df = weather_df.dropna(
-        how="any",
-        subset=["wind_speed", "precipitation", "temperature", "wind_gust_speed"],
+    keep = ~(
+        np.isnan(wind_speed)
+        | np.isnan(wind_gust_speed)
+        | weather_df["precipitation"].isna().to_numpy()
+        | weather_df["temperature"].isna().to_numpy()
     )
-
-    # Cast to int after cleaning (matches typical regression-control expectations).
-    weather_df["wind_speed"] = weather_df["wind_speed"].astype(int)
-    weather_df["wind_speed_squared"] = weather_df["wind_speed_squared"].astype(int)
-    weather_df["wind_gust_speed"] = weather_df["wind_gust_speed"].astype(int)
-    weather_df["wind_gust_dummy"] = (weather_df["wind_gust_speed"] > 0).astype(int)
-
-    # Temperature bins in Celsius (for dummy controls).
+    weather_df = weather_df[keep]
+    wind_speed = wind_speed[keep]
+    wind_gust_speed = wind_gust_speed[keep]
+
+    # Cast to int after cleaning (matches typical regression-control expectations). The wind
+    # arrays are coerced, filtered and cast once on plain numpy arrays; the square is taken
+    # before truncation, as before.
+    weather_df["wind_speed"] = wind_speed.astype(int)
+    weather_df["wind_speed_squared"] = (wind_speed ** 2).astype(int)
+    weather_df["wind_gust_speed"] = wind_gust_speed.astype(int)
+    weather_df["wind_gust_dummy"] = (weather_df["wind_gust_speed"].to_numpy() > 0).view(np.int8)
+
+    # Temperature bins in Celsius (for dummy controls): right-closed 10-degree bins between -10
+    # and 40, with open-ended bins below and above (readings outside [-100, 100] are unbinned).
+    # The bin of each reading is found with one searchsorted over the edges.
     weather_df["temperature_c"] = (weather_df["temperature"] - 32) * 5.0 / 9.0
-    weather_df["t_range"] = (
-        pd.cut(
-            weather_df["temperature_c"],
-            [-100, -10.0, 0, 10.0, 20.0, 30.0, 40.0, 100.0],
-            include_lowest=True,
-        )
-        .astype(str)
-    )
-
-    # Create dummies for each temperature bin; ensure all expected bins exist as columns.
-    temp_dummies = pd.get_dummies(weather_df["t_range"]).astype('Int8')
-    for col_name, dummy_name in zip(col_names, dummy_names):
-        weather_df[dummy_name] = temp_dummies[col_name] if col_name in temp_dummies.columns else 0
-
+    temperature_c = weather_df["temperature_c"].to_numpy(dtype=np.float64)
+    edges = np.array([-100, -10.0, 0, 10.0, 20.0, 30.0, 40.0, 100.0])
+    bin_index = np.searchsorted(edges, temperature_c, side="left") - 1
+    bin_index[temperature_c == edges[0]] = 0
+    unbinned = (bin_index < 0) | (bin_index >= len(TEMPERATURE_DUMMIES)) | np.isnan(temperature_c)
+    bin_index[unbinned] = len(TEMPERATURE_DUMMIES)
+
+    # One int8 code per reading instead of seven dummy columns; the dummies are only expanded
+    # once the weather has been matched to the flights.
+    weather_df["temp_bin"] = bin_index.astype(np.int8)
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        weather_df.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
     return weather_df
 
 
-def add_weather_data(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
+def add_weather_data(
+    flights_df: pd.DataFrame,
+    conn: sqlite3.Connection,
+    db_source: str | None = None,
+    max_workers: int | None = None,
+    cache_dir: str | Path | None = None,
+) -> pd.DataFrame:
     """
     Merge hourly weather controls onto flight-level observations by origin airport and time.
 
@@ -1108,51 +1608,130 @@ def add_weather_data(flights_df: pd.DataFrame, db_source: str) -> pd.DataFrame:
 
     Notes
     -----
-    - `merge_asof` requires both inputs to be sorted by the merge key.
-    - By default, `merge_asof` matches on the nearest key *at or before* the flight time.
-      If you intend "nearest in either direction", pass `direction="nearest"`.
+    - The as-of match is done directly on sorted int64 timestamps with `np.searchsorted`: each
+      flight takes the last weather observation at or before its departure, provided it is
+      within 2.5 hours (the same rule as `merge_asof(direction="backward")`).
+    - Only the matched weather rows are gathered per airport; the flight columns are reordered
+      once at the end instead of being copied and re-concatenated airport by airport.
+    - When `db_source` is given, airports are processed in a thread pool, each worker thread
+      reading through its own connection; results are combined in airport order, so the output is the
+      same as the serial run.
+    - Rows are returned grouped by origin airport and sorted by `DateTime` within airport.
 
     Parameters
     ----------
     flights_df : pd.DataFrame
         Flight-level data containing `origin_airport_id` and `DateTime`.
-    db_source : str
-        Path to the SQLite database.
+    conn : sqlite3.Connection
+        Open connection to the SQLite database (used when `db_source` is None).
+    db_source : str, optional
+        Path to the SQLite database. If given, airports are processed concurrently.
+    max_workers : int, optional
+        Number of threads for the concurrent path (ThreadPoolExecutor default if None).
+    cache_dir : str or Path, optional
+        Directory for the per-airport weather cache (see `analyze_weather`); requires `db_source`.
 
     Returns
     -------
     pd.DataFrame
         flights_df with weather variables appended.
     """
-    merged_chunks = []
+    tolerance = np.timedelta64(timedelta(hours=2.5)).astype("timedelta64[ns]").astype(np.int64)
+    flight_ts = flights_df["DateTime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    airport_rows = flights_df.groupby("origin_airport_id").indices
+    airports = sorted(airport_rows)
 
-    # Process airport-by-airport to avoid loading all weather tables into memory at once.
-    for airport_id, group in tqdm(
-        flights_df.groupby("origin_airport_id"),
-        total=flights_df["origin_airport_id"].nunique(),
-        desc="Merging weather by origin airport",
-    ):
+    def match_airport(airport_id, airport_conn: sqlite3.Connection) -> tuple[np.ndarray, pd.DataFrame]:
         # Load and engineer hourly weather controls for this airport.
-        weather = analyze_weather(airport_id, db_source).sort_values("DateTime")
-
-        # merge_asof requires sorted keys; we merge within a +/- tolerance window.
-        group = group.sort_values("DateTime")
-        merged = pd.merge_asof(
-            group,
-            weather,
-            on="DateTime",
-            tolerance=timedelta(hours=2.5),
-            direction="backward",
-        )
+        weather = analyze_weather(airport_id, airport_conn, db_source, cache_dir).sort_values("DateTime")
+
+        # searchsorted needs ascending timestamps, and NaT (sorted last, but the smallest int64)
+        # would break that silently; merge_asof used to raise on null keys, so do the same.
+        n_missing = int(weather["DateTime"].isna().sum())
+        if n_missing:
+            raise ValueError(
+                f"weather_{airport_id} has {n_missing} rows with a missing DateTime; "
+                "cannot match flights to weather."
+            )
+        weather_ts = weather["DateTime"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+        # Flights of this airport in departure-time order.
+        rows = airport_rows[airport_id]
+        rows = rows[np.argsort(flight_ts[rows], kind="quicksort")]
+        t = flight_ts[rows]
+
+        # Last observation at or before each departure; -1 marks no match within tolerance.
+        match = np.searchsorted(weather_ts, t, side="right") - 1
+        matched = match >= 0
+        matched[matched] = t[matched] - weather_ts[match[matched]] <= tolerance
+        match[~matched] = -1
+
+        # Reindexing with -1 yields missing values (and upcasts) exactly like an unmatched asof row.
+        return rows, weather.drop(columns="DateTime").reset_index(drop=True).reindex(match).reset_index(drop=True)
+
+    # sqlite3 connections cannot be shared across threads, so each worker thread opens one
+    # connection on its first airport and reuses it for the rest. They are closed once the
+    # pool has shut down.
+    worker = threading.local()
+    worker_conns: list[sqlite3.Connection] = []
+
+    def match_airport_worker(airport_id) -> tuple[np.ndarray, pd.DataFrame]:
+        if not hasattr(worker, "conn"):
+            worker.conn = open_connection(db_source, check_same_thread=False)
+            worker_conns.append(worker.conn)
+        return match_airport(airport_id, worker.conn)
+
+    # Only the weather tables of the airports being processed are held in memory at once.
+    desc = "Merging weather by origin airport"
+    if db_source is None:
+        results = [match_airport(airport_id, conn) for airport_id in tqdm(airports, desc=desc)]
+    else:
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(tqdm(executor.map(match_airport_worker, airports), total=len(airports), desc=desc))
+        finally:
+            for worker_conn in worker_conns:
+                worker_conn.close()
+
+    # Recombine: flights in airport/time order, with the matched weather columns alongside.
+    flights_df = flights_df.take(np.concatenate([rows for rows, _ in results])).reset_index(drop=True)
+    weather_df = expand_temperature_dummies(pd.concat([chunk for _, chunk in results], ignore_index=True))
+    return pd.concat([flights_df, weather_df], axis=1)
+
+
+def missing_value_summary(flights_df: pd.DataFrame) -> tuple[pd.Series, np.ndarray]:
+    """
+    Count missing values by column and flag the rows that have any missing value.
 
-        merged_chunks.append(merged)
+    The frame is scanned one column at a time, so only a single column's missing-value mask
+    is alive at once instead of a boolean copy of the whole frame.
 
-    # Recombine all airport-level merges.
-    flights_df = pd.concat(merged_chunks, ignore_index=True)
-    return flights_df
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Flight-level dataset.
+
+    Returns
+    -------
+    (na_counts, row_has_na) : tuple[pd.Series, np.ndarray]
+        na_counts is the number of missing values per column (in column order, as
+        `flights_df.isna().sum()`); row_has_na is a boolean array marking rows with any
+        missing value.
+    """
+    na_counts = {}
+    row_has_na = np.zeros(len(flights_df), dtype=bool)
+    for name, values in flights_df.items():
+        is_na = values.isna().to_numpy()
+        na_counts[name] = int(is_na.sum())
+        row_has_na |= is_na
+    return pd.Series(na_counts, index=flights_df.columns, dtype=np.int64), row_has_na
 
 
-def print_missing_data_summary(flights_df: pd.DataFrame) -> None:
+def print_missing_data_summary(
+    flights_df: pd.DataFrame,
+    na_counts: pd.Series | None = None,
+    row_has_na: np.ndarray | None = None,
+) -> None:
     """
     Print a compact summary of missingness for key variables and overall row completeness.
 
@@ -1166,29 +1745,34 @@ def print_missing_data_summary(flights_df: pd.DataFrame) -> None:
     ----------
     flights_df : pd.DataFrame
         Flight-level dataset.
+    na_counts, row_has_na : optional
+        Output of `missing_value_summary(flights_df)`, so the frame is scanned for missing
+        values only once across the diagnostics and the final row drop.
     """
     n = len(flights_df)
+    if na_counts is None or row_has_na is None:
+        na_counts, row_has_na = missing_value_summary(flights_df)
 
     # Selected “headline” missingness checks (variable-level).
     metrics = [
-        ("Missing tail numbers (num_seats)", flights_df["num_seats"]),
-        ("Missing weather (multiple variables)", flights_df["temp_30_40"]),
-        ("Missing load factor (load_factor)", flights_df["load_factor"]),
+        ("Missing tail numbers (num_seats)", "num_seats"),
+        ("Missing weather (multiple variables)", "temp_30_40"),
+        ("Missing load factor (load_factor)", "load_factor"),
     ]
 
-    for label, s in metrics:
-        miss_n = int(s.isna().sum())
+    for label, column in metrics:
+        miss_n = int(na_counts[column])
         miss_pct = miss_n / n if n else 0.0
         print(f"{label:<41} {miss_n:>10,}  ({miss_pct:>6.2%})")
 
     # Row-level: any missing value in any column.
-    miss_n = int(flights_df.isna().any(axis=1).sum())
+    miss_n = int(row_has_na.sum())
     miss_pct = miss_n / n if n else 0.0
     print(f"{'Missing any flight data (any NA)':<41} {miss_n:>10,}  ({miss_pct:>6.2%})")
     print("")
 
 
-def print_missing_flights(flights_df: pd.DataFrame) -> None:
+def print_missing_flights(flights_df: pd.DataFrame, na_counts: pd.Series | None = None) -> None:
     """
     Print a two-column table of missing-value counts by variable.
 
@@ -1200,12 +1784,15 @@ def print_missing_flights(flights_df: pd.DataFrame) -> None:
     ----------
     flights_df : pd.DataFrame
         Flight-level dataset.
+    na_counts : pd.Series, optional
+        Precomputed missing-value counts by column (see `missing_value_summary`).
     """
     print("Table of missing flight data:")
 
-    # Count missing values per column and keep only columns with >0 missing.
-    flights_na = flights_df.isna().sum()
-    s = flights_na[flights_na > 0].sort_values(ascending=False)
+    # Keep only columns with >0 missing.
+    if na_counts is None:
+        na_counts, _ = missing_value_summary(flights_df)
+    s = na_counts[na_counts > 0].sort_values(ascending=False)
 
     # If there are no missing values, print a friendly message and exit.
     if s.empty:
@@ -1248,7 +1835,27 @@ def save_csv_mergers(
     out_path: str | Path = "mergers_delay.csv",
     *,
     dropna: bool = False,
+    chunk_size: int = 200_000,
 ) -> None:
+    """
+    Save the merger-analysis variables to CSV.
+
+    Rows are written in slices of `chunk_size`, so only one slice of the selected columns is
+    copied at a time instead of the full frame. The CSV is written with pyarrow; whole-number
+    floats are written without a trailing ".0" (e.g. "29" rather than "29.0"), which reads
+    back to the same values.
+
+    Parameters
+    ----------
+    flights_df : pd.DataFrame
+        Flight-level dataset containing every column in the merger variable list.
+    out_path : str or Path, default "mergers_delay.csv"
+        Output CSV path (parent directories are created if needed).
+    dropna : bool, default False
+        If True, drop rows with any missing value in the saved columns.
+    chunk_size : int, default 200_000
+        Number of rows written per slice.
+    """
     col_list = [
         # Delay variables
         "dep_delay", "arr_delay",
@@ -1297,11 +1904,23 @@ def save_csv_mergers(
     if missing:
         raise KeyError(f"save_csv_mergers: missing columns: {missing}")
 
-    save_df = flights_df.loc[:, col_list]
-
-    if dropna:
-        save_df = save_df.dropna(subset=col_list, how="any")
-
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    save_df.to_csv(out_path, index=False)
+
+    # Slices are converted to Arrow and streamed through pyarrow's C++ CSV writer. The header is
+    # written by hand so it is unquoted, as pandas writes it; the columns are all numeric, so
+    # no value is quoted. An empty frame still produces a header-only file.
+    with open(out_path, "wb") as sink:
+        sink.write((",".join(col_list) + "\n").encode())
+        writer = None
+        for start in range(0, max(len(flights_df), 1), chunk_size):
+            save_df = flights_df.iloc[start:start + chunk_size].loc[:, col_list]
+
+            if dropna:
+                save_df = save_df.dropna(subset=col_list, how="any")
+
+            table = pa.Table.from_pandas(save_df, preserve_index=False)
+            if writer is None:
+                writer = pa_csv.CSVWriter(sink, table.schema, write_options=pa_csv.WriteOptions(include_header=False))
+            writer.write_table(table)
+        writer.close()
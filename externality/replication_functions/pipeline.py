@@ -5,12 +5,26 @@ from typing import Sequence
 import numpy as np
 import pandas as pd
 
-from statsmodels.regression.linear_model import WLS, OLS
+from statsmodels.regression.linear_model import WLS
 
 import matplotlib.pyplot as plt
 
 
 
+def _mvn_draws(rng, mu, Sigma, num_sims):
+    """
+    Draw `num_sims` rows from N(mu, Sigma) as an affine transform of standard normals.
+
+    The covariance is factored once with an SVD, which is the factorization
+    `Generator.multivariate_normal` uses by default, so a given seed yields the same
+    draws as before; it skips that method's per-call validation and PSD check.
+    """
+    u, s, _ = np.linalg.svd(Sigma)
+    factor = u * np.sqrt(s)
+    z = rng.standard_normal(size=(num_sims, mu.size))
+    return mu + z @ factor.T
+
+
 def basic_random_sample(
     coef_path: str | Path,
     cov_path: str | Path,
@@ -21,7 +35,8 @@ def basic_random_sample(
     Draw random samples of (hhiorigin + hhidest) using a multivariate normal approximation.
 
     Point estimates are deterministic. Simulation is used only for variance characterization.
-    The combined effect is replicated across four hub sizes.
+    The combined effect is replicated across four hub sizes; `random_sample` is a read-only
+    broadcast view of shape (num_sims, 4).
     """
     # Fixed assumptions for this paper
     reg_vars: Sequence[str] = ("hhiorigin", "hhidest")
@@ -44,13 +59,13 @@ def basic_random_sample(
 
     # --- RNG / sampling ---
     rng = np.random.default_rng(seed)
-    draws = rng.multivariate_normal(mu, Sigma, size=num_sims)
+    draws = _mvn_draws(rng, mu, Sigma, num_sims)
 
     # Combine origin + destination effects
     combined = draws.sum(axis=1)  # shape (num_sims,)
 
-    # Replicate across the four hub sizes
-    random_sample = np.repeat(combined[:, None], repeats=n_hub_sizes, axis=1)
+    # Replicate across the four hub sizes (read-only broadcast view, no copy)
+    random_sample = np.broadcast_to(combined[:, None], (num_sims, n_hub_sizes))
 
     # Deterministic point estimate replicated
     true_params = np.repeat(mu.sum(), repeats=n_hub_sizes)
@@ -106,7 +121,7 @@ def hub_random_sample(
     Sigma = cov_df.loc[reg_vars, reg_vars].to_numpy(dtype=float)  # (8, 8)
 
     rng = np.random.default_rng(seed)
-    draws = rng.multivariate_normal(mu, Sigma, size=num_sims)  # (num_sims, 8)
+    draws = _mvn_draws(rng, mu, Sigma, num_sims)  # (num_sims, 8)
 
     random_sample = draws[:, :4] + draws[:, 4:]  # (num_sims, 4)
     true_params = mu[:4] + mu[4:]                # (4,)
@@ -114,6 +129,74 @@ def hub_random_sample(
     return random_sample, true_params
 
 
+def _market_blocks(df, group_keys, sort=True):
+    """
+    Row positions of multi-airline markets, laid out contiguously by market.
+
+    Markets come in sorted key order if `sort` is True, else in order of first appearance
+    (matching `groupby(..., sort=sort)`); rows keep their original order within a market.
+    Rows with a missing key and single-airline markets are dropped.
+
+    When the key columns are integer and already sorted, market boundaries are read off the
+    key changes directly and the groupby hashing is skipped.
+
+    Returns
+    -------
+    rows : (N,) array of row positions in `df`
+    starts : (G,) array of market start offsets into `rows`
+    sizes : (G,) array of market sizes
+
+    Examples
+    --------
+    Unsorted unsigned keys still group the two rows of market 1 together:
+
+    >>> df = pd.DataFrame({"k": np.array([1, 2, 1], dtype=np.uint16)})
+    >>> rows, starts, sizes = _market_blocks(df, ["k"])
+    >>> rows.tolist(), starts.tolist(), sizes.tolist()
+    ([0, 2], [0], [2])
+
+    Rows with a missing key are dropped:
+
+    >>> df = pd.DataFrame({"k": [1, 2, 1, 2], "m": [1.0, np.nan, 1.0, 3.0]})
+    >>> rows, starts, sizes = _market_blocks(df, ["k", "m"])
+    >>> rows.tolist(), starts.tolist(), sizes.tolist()
+    ([0, 2], [0], [2])
+    """
+    keys = df[list(group_keys)].to_numpy()
+
+    presorted = False
+    if keys.dtype.kind in "iu" and len(keys) > 1:
+        # Compare neighbouring rows at their first differing column; subtracting them
+        # would wrap around for unsigned or narrow integer keys.
+        prev, curr = keys[:-1], keys[1:]
+        differs = prev != curr
+        changed = differs.any(axis=1)
+        first_col = differs.argmax(axis=1)
+        step = np.arange(first_col.size)
+        increasing = curr[step, first_col] > prev[step, first_col]
+        presorted = bool(increasing[changed].all())
+
+    if presorted:
+        codes = np.r_[0, np.cumsum(changed)]
+    else:
+        # ngroup() is NaN for rows with a missing key; those get code -1 and are dropped below.
+        codes = (
+            df.groupby(list(group_keys), sort=sort).ngroup().fillna(-1).to_numpy(dtype=np.intp)
+        )
+
+    counts = np.bincount(codes[codes >= 0], minlength=1)
+    keep = (codes >= 0) & (counts[np.maximum(codes, 0)] > 1)
+    rows = np.flatnonzero(keep)
+    if not presorted:
+        rows = rows[np.argsort(codes[rows], kind="stable")]
+
+    # Market boundaries in the grouped rows.
+    grouped_codes = codes[rows]
+    starts = np.flatnonzero(np.r_[True, grouped_codes[1:] != grouped_codes[:-1]]) if rows.size else rows
+    sizes = np.diff(np.r_[starts, rows.size])
+    return rows, starts, sizes
+
+
 def determine_effect_coeff(
     df_inputs: pd.DataFrame,
     random_sample: np.ndarray,
@@ -151,35 +234,9 @@ def determine_effect_coeff(
     if missing:
         raise ValueError(f"df_inputs missing columns: {sorted(missing)}")
 
-    effect_list = []
-    monthly_flights = []
-    market_share = []
-    airport_hub_size = []
-    group_id_first_key = []  # keeps the first key value for each row; adjust if you want a different id
+    rows, starts, sizes = _market_blocks(df_inputs, group_keys)
 
-    for _, group in df_inputs.groupby(list(group_keys)):
-        if len(group) <= 1:
-            continue
-
-        s = group["MarketShare"].to_numpy()
-        I = group[list(hub_dummy_cols)].to_numpy().astype(float)   # (n_airlines, 4)
-        S_total_by_bin = (s[:, None] * I).sum(axis=0)              # (4,)
-
-        hhi = group["HHI"].to_numpy()
-        comp_1 = 2.0 * (s - hhi)                                   # (n_airlines,)
-
-        others_by_bin = S_total_by_bin[None, :] - (s[:, None] * I) # (n_airlines, 4)
-
-        comp_2 = (random_sample @ others_by_bin.T).T               # (n_airlines, num_sims)
-        effect_mat = comp_1[:, None] * comp_2                      # (n_airlines, num_sims)
-
-        monthly_flights.append(group["MonthlyFlights"].to_numpy())
-        market_share.append(s)
-        airport_hub_size.append(group["AirportHubSize"].to_numpy())
-        group_id_first_key.append(group[group_keys[0]].to_numpy())
-        effect_list.append(effect_mat)
-
-    if not effect_list:
+    if rows.size == 0:
         return (
             np.array([]),
             np.array([]),
@@ -188,12 +245,27 @@ def determine_effect_coeff(
             np.array([]),
         )
 
+    s = df_inputs["MarketShare"].to_numpy()[rows]
+    # One-hot hub dummies kept as uint8; the product with `s` promotes to float64.
+    I = df_inputs[list(hub_dummy_cols)].to_numpy(dtype=np.uint8)[rows]    # (N, 4)
+    sI = s[:, None] * I
+    S_total_by_bin = np.repeat(np.add.reduceat(sI, starts, axis=0), sizes, axis=0)  # (N, 4)
+
+    hhi = df_inputs["HHI"].to_numpy()[rows]
+    comp_1 = 2.0 * (s - hhi)                                   # (N,)
+
+    others_by_bin = S_total_by_bin - sI                        # (N, 4)
+
+    # One (N, 4) x (4, num_sims) product for all markets at once.
+    comp_2 = others_by_bin @ random_sample.T                   # (N, num_sims)
+    effect_mat = comp_1[:, None] * comp_2                      # (N, num_sims)
+
     return (
-        np.concatenate(monthly_flights),
-        np.concatenate(market_share),
-        np.concatenate(airport_hub_size),
-        np.vstack(effect_list),
-        np.concatenate(group_id_first_key),
+        df_inputs["MonthlyFlights"].to_numpy()[rows],
+        s,
+        df_inputs["AirportHubSize"].to_numpy()[rows],
+        effect_mat,
+        df_inputs[group_keys[0]].to_numpy()[rows],
     )
 
 
@@ -223,6 +295,11 @@ def find_slopes(
         Optional array-like of shape (N,). Observation weights. If provided, weights are
         sliced by hub and used in WLS. If None, regressions are unweighted.
 
+    Raises
+    ------
+    ValueError
+        If any hub-size category has fewer than two observations.
+
     Returns
     -------
     slope_mat:
@@ -252,56 +329,56 @@ def find_slopes(
         if weights.shape[0] != hub_size.shape[0]:
             raise ValueError("weights must have the same length as hub_size.")
 
-    _, columns = effect.shape
-
     for hub in range(4):
         hub_ind = (hub_size == hub)
         n_obs = int(hub_ind.sum())
 
-        slope_vec = []
-        intercept_vec = []
+        # pinv of an empty or one-row design would return a made-up fit (all zeros for an
+        # empty hub) rather than fail, so require enough observations for the two parameters.
+        if n_obs < 2:
+            raise ValueError(
+                f"Hub {hub} has {n_obs} observation(s); at least 2 are needed to fit an intercept and slope."
+            )
 
         ms_hub = market_share[hub_ind].reshape(-1, 1)
         X = np.concatenate([np.ones_like(ms_hub), ms_hub], axis=1)
+        effect_hub = effect[hub_ind]
 
-        if weights is None:
-            w_hub = None
-        else:
+        if weights is not None:
             w_hub = weights[hub_ind]
             if np.any(w_hub <= 0):
                 raise ValueError(f"Non-positive weights found for hub {hub}.")
 
-        for column in range(columns):
-            effect_hub = effect[hub_ind, column].ravel()
+            # WLS is OLS on the sqrt(w)-whitened data (as statsmodels does it).
+            sw = np.sqrt(w_hub)
+            X = X * sw[:, None]
+            effect_hub = effect_hub * sw[:, None]
 
-            if w_hub is None:
-                results = OLS(effect_hub, X).fit()
-            else:
-                results = WLS(effect_hub, X, weights=w_hub).fit()
-
-            reg_int, reg_slope = results.params
-            slope_vec.append(reg_slope)
-            intercept_vec.append(reg_int)
-
-        slope_vec = np.asarray(slope_vec, dtype=float)
-        intercept_vec = np.asarray(intercept_vec, dtype=float)
+        # X is shared by every simulation column, so one pseudo-inverse solves all of them.
+        reg_int, reg_slope = np.linalg.pinv(X) @ effect_hub
+        slope_vec = np.asarray(reg_slope, dtype=float)
+        intercept_vec = np.asarray(reg_int, dtype=float)
 
         slope_mat.append(slope_vec)
         intercept_mat.append(intercept_vec)
 
+        # One partition per vector for all three percentiles
+        int_p2_5, int_median, int_p97_5 = np.percentile(intercept_vec, [2.5, 50, 97.5])
+        slope_p2_5, slope_median, slope_p97_5 = np.percentile(slope_vec, [2.5, 50, 97.5])
+
         summary_list[int(hub)] = {
             "n_obs": n_obs,
             "intercept": {
-                "median": float(np.percentile(intercept_vec, 50)),
+                "median": float(int_median),
                 "mean": float(intercept_vec.mean()),
-                "p2_5": float(np.percentile(intercept_vec, 2.5)),
-                "p97_5": float(np.percentile(intercept_vec, 97.5)),
+                "p2_5": float(int_p2_5),
+                "p97_5": float(int_p97_5),
             },
             "slope": {
-                "median": float(np.percentile(slope_vec, 50)),
+                "median": float(slope_median),
                 "mean": float(slope_vec.mean()),
-                "p2_5": float(np.percentile(slope_vec, 2.5)),
-                "p97_5": float(np.percentile(slope_vec, 97.5)),
+                "p2_5": float(slope_p2_5),
+                "p97_5": float(slope_p97_5),
             },
         }
 
@@ -352,16 +429,15 @@ def prob_values_different(
     if len(labels) != k:
         raise ValueError(f"`labels` must have length K={k}. Got {len(labels)}.")
 
-    # Pairwise probabilities: P(i > j)
-    # (num_sims, K, 1) > (num_sims, 1, K) -> (num_sims, K, K)
-    probs = (arr[:, :, None] > arr[:, None, :]).mean(axis=0)
+    # Pairwise probabilities: P(i > j), one row at a time so only a (num_sims, K)
+    # comparison is held in memory instead of the full (num_sims, K, K) tensor.
+    probs = np.empty((k, k), dtype=float)
+    for i in range(k):
+        probs[i] = np.count_nonzero(arr[:, i:i + 1] > arr, axis=0) / num_sims
 
-    df = pd.DataFrame(probs, index=labels, columns=labels)
+    np.fill_diagonal(probs, 0.5 if include_diagonal else np.nan)
 
-    if include_diagonal:
-        np.fill_diagonal(df.values, 0.5)
-    else:
-        np.fill_diagonal(df.values, np.nan)
+    df = pd.DataFrame(probs, index=labels, columns=labels)
 
     return df
 
@@ -382,9 +458,9 @@ def determine_effect_coeff_true(true_params, airport_airline_market):
          sum_{j ≠ i} MarketShare_j × 1{AirlineHubSize_j = h}
       3. Applies the hub-size–specific coefficients to obtain the total external effect.
 
-    This implementation avoids repeated DataFrame slicing by precomputing
-    hub-size-weighted market share totals at the group level and subtracting
-    each airline’s own contribution.
+    All markets are handled in one pass: hub-size-weighted market share totals
+    are accumulated per market and each airline’s own contribution is subtracted
+    row-wise, without iterating over groups or rows in Python.
 
     Parameters
     ----------
@@ -427,55 +503,46 @@ def determine_effect_coeff_true(true_params, airport_airline_market):
         "AirlineHubSize_3",
     ]
 
-    results = []
-
-    # Group by airport–year–month markets
-    grouped = airport_airline_market.groupby(
-        ["OriginAirportID", "Year", "Month"], sort=False
+    rows, starts, sizes = _market_blocks(
+        airport_airline_market, ["OriginAirportID", "Year", "Month"], sort=False
     )
 
-    for (_, group) in grouped:
-        num_airlines = len(group)
-        if num_airlines <= 1:
-            continue
+    s = airport_airline_market["MarketShare"].to_numpy(dtype=float)[rows]
+    hhi = airport_airline_market["HHI"].to_numpy(dtype=float)[rows]
+    I = airport_airline_market[hub_cols].to_numpy(dtype=np.uint8)[rows]   # (N, 4)
 
-        # Total hub-size-weighted market shares across all airlines in the market
-        total_hub_market_share = (
-            group[hub_cols]
-            .multiply(group["MarketShare"], axis=0)
-            .sum()
-            .to_numpy(dtype=float)
-        )
+    # Total hub-size-weighted market shares across all airlines in each market
+    sI = s[:, None] * I
+    total_hub_market_share = np.add.reduceat(sI, starts, axis=0) if rows.size else sI
 
-        for _, row in group.iterrows():
-            # Marginal concentration component
-            comp_1 = 2.0 * (row["MarketShare"] - row["HHI"])
+    # Marginal concentration component
+    comp_1 = 2.0 * (s - hhi)
 
-            # Remove the airline's own contribution from hub totals
-            own_hub_vector = row[hub_cols].to_numpy(dtype=float)
-            other_airlines_market_share = (
-                total_hub_market_share
-                - row["MarketShare"] * own_hub_vector
-            )
+    # Remove each airline's own contribution from hub totals, apply hub-size coefficients
+    other_airlines_market_share = np.repeat(total_hub_market_share, sizes, axis=0) - sI
+    comp_2 = other_airlines_market_share @ true_params
+
+    return pd.DataFrame({
+        "monthly flights": airport_airline_market["MonthlyFlights"].to_numpy()[rows],
+        "market share": s,
+        "airport hub size": airport_airline_market["AirportHubSize"].to_numpy()[rows],
+        "airline hub size": airport_airline_market["AirlineHubSize"].to_numpy()[rows],
+        "hhi": hhi,
+        "num airlines": np.repeat(sizes, sizes),
+        "airport id": airport_airline_market["OriginAirportID"].to_numpy()[rows],
+        "effect": comp_1 * comp_2,
+    })
 
-            # Apply hub-size coefficients
-            comp_2 = float(true_params @ other_airlines_market_share)
 
-            effect = comp_1 * comp_2
 
-            results.append({
-                "monthly flights": row["MonthlyFlights"],
-                "market share": row["MarketShare"],
-                "airport hub size": row["AirportHubSize"],
-                "airline hub size": row["AirlineHubSize"],
-                "hhi": row["HHI"],
-                "num airlines": num_airlines,
-                "airport id": row["OriginAirportID"],
-                "effect": effect,
-            })
+# Backends that render to files only; plt.show() is a no-op (with a warning) under these.
+_NON_INTERACTIVE_BACKENDS = {"agg", "cairo", "pdf", "pgf", "ps", "svg", "template"}
 
-    return pd.DataFrame(results)
 
+def _show_if_interactive():
+    """Call plt.show() unless matplotlib is running a file-only backend (batch runs)."""
+    if plt.get_backend().lower() not in _NON_INTERACTIVE_BACKENDS:
+        plt.show()
 
 
 def plot_true_externality(
@@ -579,14 +646,15 @@ def plot_true_externality(
             continue
 
         draw = min(n_scatter, n)
-        p = w / w.sum()
 
         # If draw == n, just take everything (no need for random)
         if draw == n:
             idx = np.arange(n)
         else:
-            # If draw > n and replace=False would fail, we already capped draw=min(...)
-            idx = rng.choice(np.arange(n), size=draw, replace=False, p=p)
+            # Weighted sampling without replacement (Efraimidis–Spirakis): keep the `draw`
+            # smallest Exp(1) / w keys, one vectorized pass instead of sequential draws.
+            keys = rng.exponential(size=n) / w
+            idx = np.argpartition(keys, draw - 1)[:draw]
 
         plt.figure(figsize=(4.25, 4))
         ax = plt.subplot(111)
@@ -603,7 +671,7 @@ def plot_true_externality(
             filename = f"{out_prefix}{hub}.{out_format}"
             plt.savefig(filename, format=out_format)
 
-        plt.show()
+        _show_if_interactive()
 
     return pd.DataFrame({"intercept": intercept_vec, "slope": slope_vec}, index=hub_desc)
 
@@ -679,34 +747,60 @@ def plot_externality_kernel_by_hub(ax, effect_df, *, bandwidth=0.05, n_grid=100,
         "Large hub airports",
     ]
 
-    for hub in range(4):
-        hub_ind = effect_df["airport hub size"] == hub
+    # Columns as NumPy arrays, stably sorted by hub size once so that each hub is a
+    # contiguous slice (rows keep their original order within a hub)
+    hub_size = effect_df["airport hub size"].to_numpy()
+    order = np.argsort(hub_size, kind="stable")
+    hub_codes = np.arange(4)
+    starts = np.searchsorted(hub_size[order], hub_codes, side="left")
+    stops = np.searchsorted(hub_size[order], hub_codes, side="right")
+
+    market_share = effect_df["market share"].to_numpy()[order]
+    effect = effect_df["effect"].to_numpy()[order]
+    weights = None if weight_col is None else effect_df[weight_col].to_numpy(dtype=float)[order]
 
-        x = np.asarray(effect_df.loc[hub_ind, "market share"])
-        y = np.asarray(effect_df.loc[hub_ind, "effect"])
+    # Kernel matrix buffer sized for the largest hub, reused by every hub
+    kernel_buf = np.empty((int((stops - starts).max()), n_grid))
 
-        if x.size == 0:
+    for hub in range(4):
+        if starts[hub] == stops[hub]:
             continue
+        rows = slice(starts[hub], stops[hub])
 
-        if weight_col is None:
-            w = np.ones_like(x, dtype=float)
-        else:
-            w = np.asarray(effect_df.loc[hub_ind, weight_col], dtype=float)
+        x = market_share[rows]
+        y = effect[rows]
+
+        # None means equal weights; handled below without materializing a vector of ones
+        w = None if weights is None else weights[rows]
 
         # Grid for smoothing
         x_smooth = np.linspace(float(x.min()), float(x.max()), n_grid)
 
-        # Gaussian kernel weights
-        distances = x[:, None] - x_smooth[None, :]
-        K = np.exp(-0.5 * (distances / bandwidth) ** 2)
-        W = K * w[:, None]
-
-        denom = W.sum(axis=0)
+        if x.min() == x.max():
+            # All observations share one market share, so every kernel weight is 1 and the
+            # smoother is the weighted mean at each (identical) grid point.
+            denom = np.full(n_grid, float(x.size) if w is None else w.sum())
+            numer = np.full(n_grid, y.sum() if w is None else w @ y)
+        else:
+            # Gaussian kernel weights, computed in place in the shared (n, n_grid) buffer
+            K = kernel_buf[:x.size]
+            np.subtract(x[:, None], x_smooth[None, :], out=K)
+            K /= bandwidth
+            np.square(K, out=K)
+            K *= -0.5
+            np.exp(K, out=K)
+
+            if w is None:
+                denom = K.sum(axis=0)
+                numer = y @ K
+            else:
+                # Denominator and numerator from one (n_grid, n) x (n, 2) product
+                denom, numer = (K.T @ np.column_stack([w, w * y])).T
 
         # Safe normalization
-        y_smooth = np.full_like(x_smooth, np.nan, dtype=float)
-        valid = denom > 0
-        y_smooth[valid] = (W[:, valid] * y[:, None]).sum(axis=0) / denom[valid]
+        y_smooth = np.divide(
+            numer, denom, out=np.full_like(x_smooth, np.nan, dtype=float), where=denom > 0
+        )
 
         ax.plot(x_smooth, y_smooth, label=hub_labels[hub])
 
@@ -744,7 +838,7 @@ def plot_kernel_density_function_true(effect_1, effect_2, bandwidth=0.05,
     fig.tight_layout()
 
     if save_path:
-        plt.savefig(save_path)
+        fig.savefig(save_path)
 
-    plt.show()
+    _show_if_interactive()
     return fig, (ax1, ax2)